@@ -0,0 +1,91 @@
+import os
+import multiprocessing
+
+# The analyzer whose bands are being worked on. Pool workers are forked after this is set, so they
+# read the worksheets from their copy of it rather than having them pickled.
+_band_analyzer = None
+
+def can_fork():
+    '''
+    Checks if worker processes can be forked, which band workers rely on to share the worksheets.
+    '''
+    return hasattr(os, 'fork')
+
+def find_band_cuts(num_lines, is_blank_line, num_bands, min_blank_run):
+    '''
+    Splits num_lines rows (or columns) into up to num_bands bands of about equal size. Each cut is
+    moved into the nearest run of at least min_blank_run blank lines within half a band of where it
+    would fall, so that blocks rarely cross the seams between bands.
+
+    Args:
+        is_blank_line: Takes a line index and returns True if the line holds no cells.
+
+    Returns:
+        The sorted line indices where each band after the first starts.
+    '''
+    band_size = num_lines // max(num_bands, 1)
+    if band_size <= 0:
+        return []
+    cuts = []
+    for band in xrange(1, num_bands):
+        target = band * band_size
+        cut = target
+        for distance in xrange(band_size // 2):
+            run = _blank_run_around(target + distance, num_lines, is_blank_line, min_blank_run)
+            if run == None and distance:
+                run = _blank_run_around(target - distance, num_lines, is_blank_line, min_blank_run)
+            if run != None:
+                cut = (run[0] + run[1]) // 2
+                break
+        if (cuts[-1] if cuts else 0) < cut < num_lines:
+            cuts.append(cut)
+    return cuts
+
+def _blank_run_around(line, num_lines, is_blank_line, min_blank_run):
+    '''
+    Gets the [start, end) of the run of blank lines holding line if it is at least min_blank_run
+    lines long, or None otherwise.
+    '''
+    if not 0 <= line < num_lines or not is_blank_line(line):
+        return None
+    start = line
+    while start > 0 and line - start < min_blank_run and is_blank_line(start - 1):
+        start -= 1
+    end = line + 1
+    while end < num_lines and end - start < min_blank_run and is_blank_line(end):
+        end += 1
+    return (start, end) if end - start >= min_blank_run else None
+
+def map_bands(analyzer, method_name, tasks, processes):
+    '''
+    Calls method_name on analyzer with the arguments of each task in a pool of worker processes.
+
+    Returns:
+        The results of each task, in the order of tasks.
+    '''
+    global _band_analyzer
+    _band_analyzer = analyzer
+    try:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            return pool.map(_run_band_task, [(method_name, task) for task in tasks])
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _band_analyzer = None
+
+def _run_band_task(method_task):
+    method_name, task = method_task
+    return getattr(_band_analyzer, method_name)(*task)
+
+class RepairedCells(object):
+    '''
+    Stands in for an OriginalValues side table in band workers to record which cells block
+    validation repaired, so only those cells need to be sent back.
+    '''
+    def __init__(self):
+        self.positions = set()
+
+    def record_replaced(self, row_index, column_index, cell):
+        self.positions.add((row_index, column_index))
@@ -3,10 +3,20 @@ import parentpath
 
 import re
 import sys
+import bisect
+import collections
+import itertools
+from array import array
 from flagable import Flagable
-from cellanalyzer import is_empty_cell, is_text_cell, is_num_cell, get_cell_type, check_cell_type
-from datawrap.tablewrap import TableTranspose
+from flagindex import FlagIndex
+from blockview import BlockView, BlockRow
+from cellanalyzer import is_empty_cell, is_text_cell, is_num_cell
 from carpenter.regex import allregex
+# NumPy is optional and only needed by TableBlock.to_columns
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class InvalidBlockError(ValueError):
     '''
@@ -14,6 +24,48 @@ class InvalidBlockError(ValueError):
     '''
     pass
 
+StarSchema = collections.namedtuple('StarSchema', ['row_titles', 'column_titles', 'units',
+                                                   'row_keys', 'column_keys', 'values',
+                                                   'unit_codes'])
+BlockColumns = collections.namedtuple('BlockColumns', ['row_labels', 'column_labels', 'values',
+                                                     'mask', 'unit_codes', 'units', 'data_start'])
+
+def _leading_titles(cells):
+    '''
+    Collects the text cells of a title walk, skipping blank cells and stopping at the first cell
+    which is neither.
+    '''
+    titles = []
+    for cell in cells:
+        if cell == None or (isinstance(cell, basestring) and not cell):
+            continue
+        elif isinstance(cell, basestring):
+            titles.append(cell)
+        else:
+            break
+    return titles
+
+# The kinds of cells told apart by get_cell_type and check_cell_type, which let
+# BlockValidator._validate_cells check cell types with table lookups
+_NONE_CELL, _EMPTY_TEXT_CELL, _TEXT_CELL, _NUM_CELL, _OTHER_CELL = range(5)
+_CELL_KINDS_BY_TYPE = { type(None): _NONE_CELL, int: _NUM_CELL, float: _NUM_CELL, bool: _NUM_CELL }
+# The get_cell_type of each kind, as 0 for None, 1 for basestring and 2 for (int, float)
+_TYPE_OF_KIND = (0, 0, 1, 2, 0)
+# Whether check_cell_type passes for each kind of cell, by the type checked against
+_KIND_MATCHES = ((True, True, False, False, False),
+                 (False, True, True, False, False),
+                 (False, False, False, True, False))
+
+def _cell_kind(cell):
+    '''
+    Gets the kind of a cell for _TYPE_OF_KIND and _KIND_MATCHES.
+    '''
+    if isinstance(cell, basestring):
+        return _TEXT_CELL if cell else _EMPTY_TEXT_CELL
+    if isinstance(cell, (int, float)):
+        return _NUM_CELL
+    return _NONE_CELL if cell == None else _OTHER_CELL
+
 class TableBlock(Flagable):
     '''
     Represents a sub-table of a data file worksheet. This provides functionality for converting to
@@ -21,16 +73,46 @@ class TableBlock(Flagable):
     '''
     def __init__(self, table_conversion, used_cells, block_start, block_end,
             worksheet=None, flags=None, units=None, complete_block=False,
-            max_title_rows=sys.maxint / 2):
+            max_title_rows=sys.maxint / 2, summary=None, originals=None, string_pool=None):
         '''
         Constructor throws an InvalidBlockError if the block is not valid or convertible to a valid
-        configuration.
+        configuration. A rejected block leaves the table and flags as they were (see
+        BlockValidator.validate_block).
 
         Args:
             complete_block: Tells the validator to assume every cell is filled in the block, which
                 speeds up checks.
             max_title_rows: Restricts the title detector to stop looking for titles after
                 max_title_rows rows.
+            summary: An optional TableSummary of table_conversion which is used to speed up
+                validation and is kept up to date with any repaired cells.
+            originals: An optional OriginalValues side table which is told about repaired cells
+                when table_conversion was converted in place.
+            string_pool: An optional StringPool which titles stringified by repairs are swapped
+                into.
+        '''
+        if not self._validate(table_conversion, used_cells, block_start, block_end, worksheet,
+                              flags, units, complete_block, max_title_rows, summary, originals,
+                              string_pool):
+            raise InvalidBlockError()
+
+    @classmethod
+    def create(cls, *args, **kwargs):
+        '''
+        Same as the constructor, but returns None rather than throwing an InvalidBlockError when the
+        block is not valid, so candidate blocks can be tried without raising and catching errors.
+        '''
+        block = cls.__new__(cls)
+        return block if block._validate(*args, **kwargs) else None
+
+    def _validate(self, table_conversion, used_cells, block_start, block_end,
+            worksheet=None, flags=None, units=None, complete_block=False,
+            max_title_rows=sys.maxint / 2, summary=None, originals=None, string_pool=None):
+        '''
+        Sets up and validates the block for the constructor and create.
+
+        Returns:
+            True if the block is valid.
         '''
         self.table = table_conversion
         self.used = used_cells
@@ -41,40 +123,51 @@ class TableBlock(Flagable):
         self.flags = flags if flags != None else {}
         self.units = units if units != None else {}
         self.worksheet = worksheet
+        self.flag_index = None
+        self._data_offsets_cache = None
         validator = BlockValidator(self.table, self.worksheet,
                                    self.flags, self.used,
                                    self.start, self.end,
                                    complete_block=self.complete_block,
-                                   max_title_rows=max_title_rows)
-        if not validator.validate_block():
-            raise InvalidBlockError()
+                                   max_title_rows=max_title_rows,
+                                   summary=summary, originals=originals,
+                                   string_pool=string_pool)
+        return validator.validate_block()
+
+    def extend_rows(self, end_row, used_cells, max_title_rows=sys.maxint / 2):
+        '''
+        Grows the block down to end_row (exclusive) without validating it again. Only the new rows
+        are checked for type changes within each row, so the caller must make sure the new rows
+        continue the block's structure such that a full validation would leave them untouched.
+
+        Args:
+            used_cells: The used cell tracking covering the new rows.
+            max_title_rows: The max_title_rows the block was constructed with.
+        '''
+        validator = BlockValidator(self.table, self.worksheet, self.flags, used_cells,
+                                   [self.end[0], self.start[1]], [end_row, self.end[1]],
+                                   complete_block=self.complete_block)
+        validator._validate_cells(check_columns=False)
+        self.end = [end_row, self.end[1]]
+        self.max_title_row = min(self.end[0], self.start[0] + int(max_title_rows))
 
     def _find_titles(self, row_index, column_index):
         '''
         Helper method to find all titles for a particular cell.
         '''
-        titles = []
-
-        for column_search in range(self.start[1], column_index):
-            cell = self.table[row_index][column_search]
-            if cell == None or (isinstance(cell, basestring) and not cell):
-                continue
-            elif isinstance(cell, basestring):
-                titles.append(cell)
-            else:
-                break
-
-        for row_search in range(self.start[0], row_index):
-            cell = self.table[row_search][column_index]
-            if cell == None or (isinstance(cell, basestring) and not cell):
-                continue
-            elif isinstance(cell, basestring):
-                titles.append(cell)
-            else:
-                break
-
+        titles = _leading_titles(self.table[row_index][column_search]
+                                 for column_search in xrange(self.start[1], column_index))
+        titles.extend(_leading_titles(self.table[row_search][column_index]
+                                      for row_search in xrange(self.start[0], row_index)))
         return titles
 
+    def view(self):
+        '''
+        Gets a BlockView of the block as it was originally specified by start and end, which reads
+        its rows, columns and cells straight from the table without copying them.
+        '''
+        return BlockView(self.table, self.start, self.end)
+
     def copy_raw_block(self):
         '''
         Copies the block as it was originally specified by start and end into a new table.
@@ -82,19 +175,10 @@ class TableBlock(Flagable):
         Returns:
             A copy of the block with no block transformations.
         '''
-        ctable = []
-        r, c = 0, 0
         try:
-            for row_index in range(self.start[0], self.end[0]):
-                r = row_index
-                row = []
-                ctable.append(row)
-                for column_index in range(self.start[1], self.end[1]):
-                    c = column_index
-                    row.append(self.table[row_index][column_index])
-        except IndexError:
-            raise InvalidBlockError('Missing table element at [%d, %d]' % (r, c))
-        return ctable
+            return self.view().copy()
+        except IndexError as e:
+            raise InvalidBlockError(str(e))
 
     def copy_numbered_block(self):
         '''
@@ -109,6 +193,117 @@ class TableBlock(Flagable):
         raw_block.insert(0, range(self.start[1], self.end[1]))
         return raw_block
 
+    def to_columns(self):
+        '''
+        Exports the block as NumPy arrays. The title rows of the block are the rows above its first
+        row holding a number and the title columns are the columns left of its first column
+        holding one, which leaves the numbers in a data region below and right of the titles. The
+        cells of the block are read into a float array in one pass, without building rows.
+
+        Returns:
+            A BlockColumns of:
+            row_labels: The list of titles of each data row, read across the title columns as in
+                convert_to_row_table.
+            column_labels: The list of titles of each data column, read down the title rows.
+            values: A 2D float64 array of the data region, holding NaN where a cell isn't a number.
+            mask: A 2D boolean array which is True where values is NaN.
+            unit_codes: A 2D int array of the index in units of each cell's unit, or -1.
+            units: The list of distinct units of the data region.
+            data_start: The (row, column) of the first cell of the data region in the table.
+        '''
+        if numpy == None:
+            raise ImportError("TableBlock.to_columns requires numpy")
+        num_rows = self.end[0] - self.start[0]
+        num_columns = self.end[1] - self.start[1]
+        nan = float('nan')
+        cells = itertools.chain.from_iterable(
+            itertools.islice(self.table[row_index], self.start[1], self.end[1])
+            for row_index in xrange(self.start[0], self.end[0]))
+        cells = numpy.fromiter((cell if cell != None and isinstance(cell, (int, float, long))
+                                else nan for cell in cells),
+                               dtype=numpy.float64, count=num_rows * num_columns)
+        cells = cells.reshape((num_rows, num_columns))
+        has_data = ~numpy.isnan(cells)
+        if has_data.any():
+            first_row = int(has_data.any(axis=1).argmax())
+            first_column = int(has_data.any(axis=0).argmax())
+        else:
+            first_row, first_column = num_rows, num_columns
+        data_start = (self.start[0] + first_row, self.start[1] + first_column)
+
+        values = cells[first_row:, first_column:]
+        row_labels = [_leading_titles(self.table[row_index][column_index]
+                                      for column_index in xrange(self.start[1], data_start[1]))
+                      for row_index in xrange(data_start[0], self.end[0])]
+        column_labels = [_leading_titles(self.table[row_index][column_index]
+                                         for row_index in xrange(self.start[0], data_start[0]))
+                         for column_index in xrange(data_start[1], self.end[1])]
+
+        unit_codes = numpy.empty(values.shape, dtype=numpy.int32)
+        unit_codes.fill(-1)
+        located_units = [(location, unit) for location, unit in self.units.iteritems()
+                         if isinstance(location, tuple) and
+                         data_start[0] <= location[0] < self.end[0] and
+                         data_start[1] <= location[1] < self.end[1]]
+        units = sorted(set(unit for _, unit in located_units))
+        if located_units:
+            codes = dict((unit, code) for code, unit in enumerate(units))
+            count = len(located_units)
+            unit_codes[numpy.fromiter((location[0] for location, _ in located_units),
+                                      dtype=numpy.intp, count=count) - data_start[0],
+                       numpy.fromiter((location[1] for location, _ in located_units),
+                                      dtype=numpy.intp, count=count) - data_start[1]] = \
+                numpy.fromiter((codes[unit] for _, unit in located_units), dtype=numpy.int32,
+                               count=count)
+        return BlockColumns(row_labels, column_labels, values,
+                            ~has_data[first_row:, first_column:], unit_codes, units, data_start)
+
+    def to_star_schema(self):
+        '''
+        Exports the numbers of the block as a star schema, where each distinct list of row titles
+        and of column titles is kept once in a dimension table and every number is a fact which
+        refers to its titles by their index. Row titles and column titles are found as in
+        convert_to_row_table, so its row for a fact is the fact's row titles, then its column
+        titles, then its value and unit. Facts are in the same order as those rows. Blocks without
+        numbers have no facts.
+
+        Returns:
+            A StarSchema of:
+            row_titles: The list of distinct tuples of row titles.
+            column_titles: The list of distinct tuples of column titles.
+            units: The list of distinct units.
+            row_keys: An array of the index in row_titles of each fact.
+            column_keys: An array of the index in column_titles of each fact.
+            values: A float array of the value of each fact.
+            unit_codes: An array of the index in units of each fact's unit, or -1.
+        '''
+        schema = StarSchema([], [], [], array('i'), array('i'), array('d'), array('i'))
+        keys = ({}, {}, {})
+        def key(dimension, value):
+            dimension_keys = keys[dimension]
+            if value not in dimension_keys:
+                dimension_keys[value] = len(schema[dimension])
+                schema[dimension].append(value)
+            return dimension_keys[value]
+
+        units = self.units
+        last_row_titles = None
+        last_column_titles = {}
+        for row_index, column_index, row_titles, column_titles, cell in self._iter_data_cells(
+                self.start[0], 0):
+            # Title lists are shared, so each one is only looked up once
+            if row_titles is not last_row_titles:
+                last_row_titles = row_titles
+                row_key = key(0, tuple(row_titles))
+            if column_index not in last_column_titles:
+                last_column_titles[column_index] = key(1, tuple(column_titles))
+            unit = units.get((row_index, column_index))
+            schema.row_keys.append(row_key)
+            schema.column_keys.append(last_column_titles[column_index])
+            schema.values.append(cell)
+            schema.unit_codes.append(-1 if unit == None else key(2, unit))
+        return schema
+
     def convert_to_row_table(self, add_units=True):
         '''
         Converts the block into row titled elements. These elements are copied into the return
@@ -120,32 +315,128 @@ class TableBlock(Flagable):
         Returns:
             A row-titled table representing the data in the block.
         '''
-        rtable = []
-        if add_units:
-            relavent_units = self.get_relavent_units()
+        return list(self.iter_row_table(add_units))
 
-        # Create a row for each data element
-        for row_index in range(self.start[0], self.end[0]):
-            for column_index in range(self.start[1], self.end[1]):
-                cell = self.table[row_index][column_index]
-                if cell != None and isinstance(cell, (int, float, long)):
-                    titles = self._find_titles(row_index, column_index)
-                    titles.append(cell)
-                    if add_units:
-                        titles.append(relavent_units.get((row_index, column_index)))
-                    rtable.append(titles)
+    def iter_row_table(self, add_units=True):
+        '''
+        Same as convert_to_row_table, but yields the rows of the row-titled table one at a time so
+        that large blocks can be written out without holding the whole table. The block's table
+        must not change while the rows are being read.
+
+        Args:
+            add_units: Indicates if units should be appened to each row item.
+        '''
+        relavent_units = self.get_relavent_units() if add_units else None
+
+        found_data = False
+        for titles in self._iter_data_rows(self.start[0], 0, relavent_units):
+            found_data = True
+            yield titles
 
         # If we had all 'titles', just return the original block
-        if not rtable:
+        if not found_data:
             for row_index in range(self.start[0], self.end[0]):
-                row = []
-                rtable.append(row)
-                for column_index in range(self.start[1], self.end[1]):
-                    row.append(self.table[row_index][column_index])
-                if add_units:
-                    row.append(relavent_units.get((row_index, column_index)))
+                yield self._titles_row(row_index, relavent_units)
+
+    def row_table_slice(self, offset, limit, add_units=True):
+        '''
+        Builds rows offset to offset + limit (exclusive) of convert_to_row_table without building
+        the rows before them. The number of numeric cells in each row of the block is counted once
+        and kept, so later slices seek straight to the row holding the offset-th numeric cell.
+
+        Args:
+            offset: The index of the first row table row to return.
+            limit: The most rows to return.
+            add_units: Indicates if units should be appened to each row item.
 
-        return rtable
+        Returns:
+            The list of row-titled rows, which is shorter than limit past the end of the table.
+        '''
+        if offset < 0 or limit < 0:
+            raise ValueError("Row table slices need a non-negative offset and limit")
+        # Only cells of the block are looked up, which are all related to the block
+        units = self.units if add_units else None
+        data_offsets = self._data_offsets()
+        if not data_offsets[-1]:
+            start_row = self.start[0] + offset
+            return [self._titles_row(row_index, units)
+                    for row_index in xrange(start_row, min(start_row + limit, self.end[0]))]
+        row_offset = bisect.bisect_right(data_offsets, offset) - 1
+        return list(itertools.islice(self._iter_data_rows(self.start[0] + row_offset,
+                offset - data_offsets[row_offset], units), limit))
+
+    def _data_offsets(self):
+        '''
+        Gets the prefix sums of the number of numeric cells in each row of the block, such that
+        the numeric cells of the i-th row start at row table row i of the result. The sums are
+        counted again whenever the block's bounds have changed.
+        '''
+        bounds = (tuple(self.start), tuple(self.end))
+        if self._data_offsets_cache == None or self._data_offsets_cache[0] != bounds:
+            data_offsets = [0]
+            count = 0
+            for row_index in xrange(self.start[0], self.end[0]):
+                table_row = self.table[row_index]
+                for column_index in xrange(self.start[1], self.end[1]):
+                    cell = table_row[column_index]
+                    if cell != None and isinstance(cell, (int, float, long)):
+                        count += 1
+                data_offsets.append(count)
+            self._data_offsets_cache = (bounds, data_offsets)
+        return self._data_offsets_cache[1]
+
+    def _iter_data_rows(self, start_row, skip_cells, units=None):
+        '''
+        Yields the row-titled rows of the numeric cells of the block from start_row onwards,
+        skipping the first skip_cells numeric cells of start_row.
+
+        Args:
+            units: The units to append to each row, or None to leave units out.
+        '''
+        for row_index, column_index, row_titles, column_titles, cell in self._iter_data_cells(
+                start_row, skip_cells):
+            titles = row_titles + column_titles
+            titles.append(cell)
+            if units != None:
+                titles.append(units.get((row_index, column_index)))
+            yield titles
+
+    def _iter_data_cells(self, start_row, skip_cells):
+        '''
+        Yields (row#, column#, row titles, column titles, cell) of the numeric cells of the block
+        from start_row onwards, skipping the first skip_cells numeric cells of start_row. The
+        title lists are shared by every cell of a row (or column) and must not be changed.
+        '''
+        # The title walks of _find_titles stop at the first non-text cell, which for a numeric cell
+        # is never past the cell itself. So every numeric cell of a row (or column) shares the
+        # same titles and they are only found once per row and once per column.
+        column_titles = {}
+        for row_index in xrange(start_row, self.end[0]):
+            table_row = self.table[row_index]
+            row_titles = None
+            for column_index in xrange(self.start[1], self.end[1]):
+                cell = table_row[column_index]
+                if cell != None and isinstance(cell, (int, float, long)):
+                    if skip_cells:
+                        skip_cells -= 1
+                        continue
+                    if row_titles == None:
+                        row_titles = _leading_titles(table_row[column_search] for column_search
+                                                     in xrange(self.start[1], column_index))
+                    if column_index not in column_titles:
+                        column_titles[column_index] = _leading_titles(
+                            self.table[row_search][column_index]
+                            for row_search in xrange(self.start[0], row_index))
+                    yield row_index, column_index, row_titles, column_titles[column_index], cell
+
+    def _titles_row(self, row_index, units=None):
+        '''
+        Copies a row of a block without numeric cells as a row of its row table.
+        '''
+        row = BlockRow(self.table[row_index], self.start[1], self.end[1]).copy()
+        if units != None:
+            row.append(units.get((row_index, self.end[1] - 1)))
+        return row
 
     def flag_is_related(self, flag):
         '''
@@ -177,26 +468,35 @@ class TableBlock(Flagable):
         else:
             return same_worksheet
 
-    def get_relavent_flags(self):
+    def get_relavent_flags(self, levels=None):
         '''
-        Retrieves the relevant flags for this data block.
+        Retrieves the relevant flags for this data block. Flags are looked up through the
+        FlagIndex of the block's flags, so only the flags within the block's rows are checked.
+
+        Args:
+            levels: The flag levels to retrieve. Defaults to every level.
 
         Returns:
             All flags related to this block.
         '''
+        flag_index = self._get_flag_index()
         relavent_flags = {}
-
-        for code, flags_list in self.flags.items():
-            relavent_flags[code] = []
-            for flag in flags_list:
-                if self.flag_is_related(flag):
-                    relavent_flags[code].append(flag)
-            # Remove that flag level if no error exists
-            if not relavent_flags[code]:
-                del relavent_flags[code]
-
+        for code in (self.flags.keys() if levels == None else levels):
+            level_flags = flag_index.related_flags(code, self)
+            # Leave out flag levels where no error exists
+            if level_flags:
+                relavent_flags[code] = level_flags
         return relavent_flags
 
+    def _get_flag_index(self):
+        '''
+        Gets the FlagIndex of the block's flags, which is shared with the other blocks of the
+        worksheet when the analyzer provides it and is otherwise built for the block.
+        '''
+        if self.flag_index == None or self.flag_index.flags is not self.flags:
+            self.flag_index = FlagIndex(self.flags)
+        return self.flag_index
+
     def get_relavent_units(self):
         '''
         Retrieves the relevant units for this data block.
@@ -217,9 +517,14 @@ class TableBlock(Flagable):
         Determines the worst flag present in the provided flags. If no flags are given then a
         'minor' value is returned.
 
-        No argument version of parent function.
+        No argument version of parent function. Levels are checked from worst to best and each
+        check stops at the first related flag.
         '''
-        return Flagable.get_worst_flag_level(self, self.get_relavent_flags())
+        flag_index = self._get_flag_index()
+        for code in sorted(self.flags, key=lambda code: self.FLAG_LEVELS[code], reverse=True):
+            if flag_index.has_related_flags(code, self):
+                return Flagable.get_worst_flag_level(self, [code])
+        return Flagable.get_worst_flag_level(self, [])
 
 class BlockValidator(Flagable):
     '''
@@ -233,8 +538,14 @@ class BlockValidator(Flagable):
     return is set to False.
     '''
     def __init__(self, table, worksheet, flags, used_cells, block_start, block_end,
-            complete_block=False, max_title_rows=sys.maxint / 2):
+            complete_block=False, max_title_rows=sys.maxint / 2, summary=None, originals=None,
+            string_pool=None):
         self.table = table
+        self.summary = summary
+        self.originals = originals
+        self.string_pool = string_pool
+        # The (row#, column#, old cell) of each repair made by validate_block, in order
+        self._repairs = None
         self.worksheet = worksheet
         self.flags = flags
         self.used_cells = used_cells
@@ -250,6 +561,55 @@ class BlockValidator(Flagable):
 
         This maybe should have been written via state machines... Also suggested as being possibly
         written with code-injection.
+
+        Validation is done as a transaction. Flags are raised into a pending dictionary and each
+        repaired cell is journaled with its old value, so a rejected block puts its repairs back
+        and drops its flags, while an accepted block adds its flags to flags and tells originals
+        about its repairs. Cells are only marked in used_cells by the last pass, once the block
+        can no longer be rejected.
+
+        Returns:
+            True if the block is valid.
+        '''
+        shared_flags = self.flags
+        self.flags = {}
+        self._repairs = []
+        valid = False
+        try:
+            valid = self._check_and_repair()
+        finally:
+            if valid:
+                self._commit(shared_flags)
+            else:
+                self._rollback()
+            self.flags = shared_flags
+            self._repairs = None
+        return valid
+
+    def _commit(self, shared_flags):
+        '''
+        Adds the pending flags of validate_block to shared_flags and records its repairs.
+        '''
+        for level, level_flags in self.flags.iteritems():
+            shared_flags.setdefault(level, []).extend(level_flags)
+        if self.originals != None:
+            for row_index, column_index, old_cell in self._repairs:
+                self.originals.record_replaced(row_index, column_index, old_cell)
+
+    def _rollback(self):
+        '''
+        Puts back the cells repaired by validate_block, newest first.
+        '''
+        for row_index, column_index, old_cell in reversed(self._repairs):
+            table_row = self.table[row_index]
+            if self.summary != None:
+                self.summary.update_cell(row_index, column_index, table_row[column_index],
+                                         old_cell)
+            table_row[column_index] = old_cell
+
+    def _check_and_repair(self):
+        '''
+        Runs the checks and repairs of validate_block.
         '''
         # Don't allow for 0 width or 0 height blocks
         if self._check_zero_size():
@@ -267,8 +627,7 @@ class BlockValidator(Flagable):
             self._fill_column_holes()
 
         # Check for invalid data after repairs
-        self._validate_rows()
-        self._validate_columns()
+        self._validate_cells()
 
         # We're valid enough to be used -- though error flags may have
         # been thrown into flags.
@@ -327,9 +686,9 @@ class BlockValidator(Flagable):
         '''
         # Repair any title columns
         check_for_title = True
+        start_row = self.table[self.start[0]]
         for column_index in range(self.start[1], self.end[1]):
-            table_column = TableTranspose(self.table)[column_index]
-            column_start = table_column[self.start[0]]
+            column_start = start_row[column_index]
 
             # Only iterate through columns starting with a blank cell
             if check_for_title and is_empty_cell(column_start):
@@ -356,63 +715,72 @@ class BlockValidator(Flagable):
         '''
         Same as _fill_row_holes but for columns.
         '''
+        start_row = self.table[self.start[0]]
         for column_index in range(self.start[1], self.end[1]):
-            table_column = TableTranspose(self.table)[column_index]
-            column_start = table_column[self.start[0]]
+            column_start = start_row[column_index]
             if is_text_cell(column_start):
                 self._check_fill_title_column(column_index)
 
-    def _validate_rows(self):
-        '''
-        Checks for any missing data row by row. It also checks for changes in cell type and flags
-        multiple switches as an error.
+    def _validate_cells(self, check_columns=True):
         '''
+        Checks for any missing data row by row. It also checks for changes in cell type along each
+        row and each column and flags multiple switches as an error.
+
+        Rows and columns are checked together in a single pass over the rows of the block, with
+        the type tracking of every column kept side by side. Column flags are held back until the
+        pass ends and then raised in column order, so flags come out in the same order as checking
+        every row and then every column.
+
+        Args:
+            check_columns: Also checks for type changes along each column.
+        '''
+        kinds_by_type = _CELL_KINDS_BY_TYPE
+        type_of_kind = _TYPE_OF_KIND
+        kind_matches = _KIND_MATCHES
+        start_column, end_column = self.start[1], self.end[1]
+        columns = range(start_column, end_column)
+        column_types = []
+        if check_columns and self.end[0] > self.start[0]:
+            first_row = self.table[self.start[0]]
+            column_types = [type_of_kind[_cell_kind(first_row[column_index])]
+                            for column_index in columns]
+        # Whether each column has changed type once yet
+        column_changed = [False] * len(columns)
+        column_warnings = {}
         for row_index in range(self.start[0], self.end[0]):
             table_row = self.table[row_index]
             used_row = self.used_cells[row_index]
 
-            row_type = None
-            if self.end[1] > self.start[1]:
-                row_type = get_cell_type(table_row[self.start[1]])
-
-            num_type_changes = 0
-            for column_index in range(self.start[1], self.end[1]):
+            row_type = type_of_kind[_cell_kind(table_row[start_column])] if columns else 0
+            row_changed = False
+            for offset, column_index in enumerate(columns):
+                cell = table_row[column_index]
+                kind = kinds_by_type.get(type(cell))
+                if kind == None:
+                    kind = _cell_kind(cell)
                 if used_row[column_index]:
                     self.flag_change(self.flags, 'error', (row_index, column_index),
                                      self.worksheet, self.FLAGS['used'])
-                if not check_cell_type(table_row[column_index], row_type):
-                    row_type = get_cell_type(table_row[column_index])
-                    num_type_changes += 1
-                if num_type_changes > 1:
-                    self.flag_change(self.flags, 'warning', (row_index, column_index-1),
-                                     self.worksheet, self.FLAGS['unexpected-change'])
-                    # Decrement this to catch other cells which change again
-                    num_type_changes -= 1
+                if not kind_matches[row_type][kind]:
+                    row_type = type_of_kind[kind]
+                    # Flag every change after the first
+                    if row_changed:
+                        self.flag_change(self.flags, 'warning', (row_index, column_index-1),
+                                         self.worksheet, self.FLAGS['unexpected-change'])
+                    row_changed = True
                 # Mark this cell as used
                 used_row[column_index] = True
 
-    def _validate_columns(self):
-        '''
-        Same as _validate_rows but for columns. Also ignore used_cells as _validate_rows should
-        update used_cells.
-        '''
-        for column_index in range(self.start[1], self.end[1]):
-            table_column = TableTranspose(self.table)[column_index]
-
-            column_type = None
-            if self.end[0] > self.start[0]:
-                column_type = get_cell_type(table_column[self.start[0]])
+                if check_columns and not kind_matches[column_types[offset]][kind]:
+                    column_types[offset] = type_of_kind[kind]
+                    if column_changed[offset]:
+                        column_warnings.setdefault(column_index, []).append(row_index-1)
+                    column_changed[offset] = True
 
-            num_type_changes = 0
-            for row_index in range(self.start[0], self.end[0]):
-                if not check_cell_type(table_column[row_index], column_type):
-                    column_type = get_cell_type(table_column[row_index])
-                    num_type_changes += 1
-                if num_type_changes > 1:
-                    self.flag_change(self.flags, 'warning', (row_index-1, column_index),
-                                     self.worksheet, self.FLAGS['unexpected-change'])
-                    # Decrement this to catch other cells which change again
-                    num_type_changes -= 1
+        for column_index in sorted(column_warnings):
+            for row_index in column_warnings[column_index]:
+                self.flag_change(self.flags, 'warning', (row_index, column_index),
+                                 self.worksheet, self.FLAGS['unexpected-change'])
 
     def _stringify_row(self, row_index):
         '''
@@ -423,21 +791,39 @@ class BlockValidator(Flagable):
         for column_index in range(self.start[1], self.end[1]):
             cell, changed = self._check_interpret_cell(table_row[column_index], prior_cell, row_index, column_index)
             if changed:
-                table_row[column_index] = cell
+                self._set_cell(row_index, column_index, cell)
             prior_cell = cell
 
     def _stringify_column(self, column_index):
         '''
         Same as _stringify_row but for columns.
         '''
-        table_column = TableTranspose(self.table)[column_index]
         prior_cell = None
         for row_index in range(self.start[0], self.end[0]):
-            cell, changed = self._check_interpret_cell(table_column[row_index], prior_cell, row_index, column_index)
+            cell, changed = self._check_interpret_cell(self.table[row_index][column_index],
+                                                       prior_cell, row_index, column_index)
             if changed:
-                table_column[row_index] = cell
+                self._set_cell(row_index, column_index, cell)
             prior_cell = cell
 
+    def _set_cell(self, row_index, column_index, cell):
+        '''
+        Replaces a table cell, keeping the table summary and original values up to date if they are
+        present. Within validate_block the old cell is journaled instead, and originals is only
+        told about it once the block is accepted.
+        '''
+        if self.string_pool != None and isinstance(cell, basestring):
+            cell = self.string_pool.intern(cell)
+        table_row = self.table[row_index]
+        old_cell = table_row[column_index]
+        if self.summary != None:
+            self.summary.update_cell(row_index, column_index, old_cell, cell)
+        if self._repairs != None:
+            self._repairs.append((row_index, column_index, old_cell))
+        elif self.originals != None:
+            self.originals.record_replaced(row_index, column_index, old_cell)
+        table_row[column_index] = cell
+
     def _check_interpret_cell(self, cell, prior_cell, row_index, column_index):
         '''
         Helper function which checks cell type and performs cell translation to strings where
@@ -469,7 +855,16 @@ class BlockValidator(Flagable):
         '''
         table_row = self.table[row_index]
         # Determine if the whole row is titles
-        prior_row = self.table[row_index-1] if row_index > 0 else table_row
+        prior_index = row_index-1 if row_index > 0 else row_index
+        if self.summary != None:
+            found_num = [self.summary.row(index).has_num_between(self.start[1], self.end[1])
+                         for index in (row_index, prior_index)]
+            if True in found_num:
+                return
+            if found_num == [False, False]:
+                self._stringify_row(row_index)
+                return
+        prior_row = self.table[prior_index]
         for column_index in range(self.start[1], self.end[1]):
             if is_num_cell(table_row[column_index]) or is_num_cell(prior_row[column_index]):
                 return
@@ -481,10 +876,18 @@ class BlockValidator(Flagable):
         Same as _check_fill_title_row but for columns.
         '''
         # Determine if the whole column is titles
-        table_column = TableTranspose(self.table)[column_index]
-        prior_column = TableTranspose(self.table)[column_index-1] if column_index > 0 else table_column
+        prior_index = column_index-1 if column_index > 0 else column_index
+        if self.summary != None:
+            found_num = [self.summary.column(index).has_num_between(self.start[0], self.end[0])
+                         for index in (column_index, prior_index)]
+            if True in found_num:
+                return
+            if found_num == [False, False]:
+                self._stringify_column(column_index)
+                return
         for row_index in range(self.start[0], self.end[0]):
-            if is_num_cell(table_column[row_index]) or is_num_cell(prior_column[row_index]):
+            table_row = self.table[row_index]
+            if is_num_cell(table_row[column_index]) or is_num_cell(table_row[prior_index]):
                 return
         # Since we're a title row, stringify the column
         self._stringify_column(column_index)
@@ -513,11 +916,10 @@ class BlockValidator(Flagable):
         '''
         Same as _check_stringify_year_row but for columns.
         '''
-        table_column = TableTranspose(self.table)[column_index]
         # State trackers
         prior_year = None
         for row_index in range(self.start[0]+1, self.end[0]):
-            current_year = table_column[row_index]
+            current_year = self.table[row_index][column_index]
             if not self._check_years(current_year, prior_year):
                 return
             # Only copy when we see a non-empty entry
@@ -0,0 +1,195 @@
+def _line_bounds(index, length):
+    '''
+    Resolves an index or slice along a view of length cells into a [start, end) range of offsets,
+    or a single offset for an index. Slices must step by 1 as views only cover rectangles.
+    '''
+    if isinstance(index, slice):
+        start, end, step = index.indices(length)
+        if step != 1:
+            raise ValueError("Block views can only be sliced with a step of 1")
+        return start, max(start, end)
+    if index < 0:
+        index += length
+    if index < 0 or index >= length:
+        raise IndexError("Block view index out of range")
+    return index
+
+class BlockView(object):
+    '''
+    A read only window onto the rectangle of a table between start and end (exclusive), such as
+    a block of a processed table. Rows, columns and cells are read straight from the table, so
+    taking a view costs the same however large the block is. Indexing a view gives a BlockRow,
+    slicing it gives a narrower BlockView, and view[row#, column#] gives a cell, where either index
+    may also be a slice. Positions are relative to start. Use copy to get the cells as new lists.
+
+    The view sees later changes to the table, so it should be copied when the table may change
+    while it's in use.
+
+    Args:
+        table: The 2D table to view.
+        start: The (row#, column#) of the view's top left cell.
+        end: The (row#, column#) just past the view's bottom right cell.
+    '''
+    __slots__ = ('table', 'start', 'end')
+
+    def __init__(self, table, start, end):
+        self.table = table
+        self.start = (start[0], start[1])
+        self.end = (max(start[0], end[0]), max(start[1], end[1]))
+
+    @property
+    def shape(self):
+        '''
+        The (number of rows, number of columns) of the view.
+        '''
+        return (self.end[0] - self.start[0], self.end[1] - self.start[1])
+
+    def __len__(self):
+        return self.end[0] - self.start[0]
+
+    def __getitem__(self, index):
+        num_rows, num_columns = self.shape
+        if isinstance(index, tuple):
+            row_index, column_index = index
+        else:
+            row_index, column_index = index, slice(None)
+        rows = _line_bounds(row_index, num_rows)
+        columns = _line_bounds(column_index, num_columns)
+        if isinstance(rows, tuple):
+            if isinstance(columns, tuple):
+                return BlockView(self.table, (self.start[0] + rows[0], self.start[1] + columns[0]),
+                                 (self.start[0] + rows[1], self.start[1] + columns[1]))
+            return BlockColumn(self.table, self.start[1] + columns, self.start[0] + rows[0],
+                               self.start[0] + rows[1])
+        row = self.table[self.start[0] + rows]
+        if isinstance(columns, tuple):
+            return BlockRow(row, self.start[1] + columns[0], self.start[1] + columns[1])
+        return row[self.start[1] + columns]
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self):
+        '''
+        Yields a BlockRow for each row of the view.
+        '''
+        table = self.table
+        start_column, end_column = self.start[1], self.end[1]
+        for row_index in xrange(self.start[0], self.end[0]):
+            yield BlockRow(table[row_index], start_column, end_column)
+
+    def columns(self):
+        '''
+        Yields a BlockColumn for each column of the view.
+        '''
+        for column_index in xrange(self.start[1], self.end[1]):
+            yield BlockColumn(self.table, column_index, self.start[0], self.end[0])
+
+    def copy(self):
+        '''
+        Copies the cells of the view into a new list of rows.
+
+        Raises:
+            IndexError: If the table doesn't hold every cell of the view.
+        '''
+        table = self.table
+        start_column, end_column = self.start[1], self.end[1]
+        copied = []
+        for row_index in xrange(self.start[0], self.end[0]):
+            if row_index >= len(table):
+                raise IndexError('Missing table element at [%d, %d]' % (row_index, start_column))
+            row = table[row_index]
+            if len(row) < end_column:
+                raise IndexError('Missing table element at [%d, %d]' %
+                                 (row_index, max(len(row), start_column)))
+            cells = row[start_column:end_column]
+            copied.append(cells if isinstance(cells, list) else list(cells))
+        return copied
+
+    def __eq__(self, other):
+        return len(self) == len(other) and all(row == other_row
+                                               for row, other_row in zip(self, other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'BlockView(%r, %r)' % (self.start, self.end)
+
+class _BlockLine(object):
+    '''
+    The shared parts of BlockRow and BlockColumn, which view a [start, end) range of cells along
+    a single row or column of a table.
+    '''
+    __slots__ = ()
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        bounds = _line_bounds(index, len(self))
+        if isinstance(bounds, tuple):
+            return self._line(self.start + bounds[0], self.start + bounds[1])
+        return self._cell(self.start + bounds)
+
+    def __iter__(self):
+        for position in xrange(self.start, self.end):
+            yield self._cell(position)
+
+    def copy(self):
+        '''
+        Copies the cells of the line into a new list.
+        '''
+        return list(self)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+class BlockRow(_BlockLine):
+    '''
+    A read only view of the cells of a table row between the start and end columns (exclusive).
+    '''
+    __slots__ = ('row', 'start', 'end')
+
+    def __init__(self, row, start, end):
+        self.row = row
+        self.start = start
+        self.end = end
+
+    def _cell(self, column_index):
+        return self.row[column_index]
+
+    def _line(self, start, end):
+        return BlockRow(self.row, start, end)
+
+    def copy(self):
+        cells = self.row[self.start:self.end]
+        return cells if isinstance(cells, list) else list(cells)
+
+    def __repr__(self):
+        return 'BlockRow(%d, %d, %r)' % (self.start, self.end, self.copy())
+
+class BlockColumn(_BlockLine):
+    '''
+    A read only view of the cells of a table column between the start and end rows (exclusive).
+    '''
+    __slots__ = ('table', 'column_index', 'start', 'end')
+
+    def __init__(self, table, column_index, start, end):
+        self.table = table
+        self.column_index = column_index
+        self.start = start
+        self.end = end
+
+    def _cell(self, row_index):
+        return self.table[row_index][self.column_index]
+
+    def _line(self, start, end):
+        return BlockColumn(self.table, self.column_index, start, end)
+
+    def __repr__(self):
+        return 'BlockColumn(%d, %d, %d, %r)' % (self.column_index, self.start, self.end,
+                                                  self.copy())
@@ -0,0 +1,52 @@
+def merge_overlapping_bounds(boxes):
+    '''
+    Merges any inclusive [min_row, min_column, max_row, max_column] boxes which overlap until no two
+    boxes share a cell.
+
+    Returns:
+        The merged boxes sorted by their top left corners.
+    '''
+    merged = True
+    while merged:
+        merged = False
+        kept = []
+        active = []
+        for box in sorted(boxes):
+            # Boxes which end above the current box can't overlap anything after it
+            active = [other for other in active if other[2] >= box[0]]
+            for other in active:
+                if other[1] <= box[3] and box[1] <= other[3]:
+                    other[2] = max(other[2], box[2])
+                    other[1] = min(other[1], box[1])
+                    other[3] = max(other[3], box[3])
+                    merged = True
+                    break
+            else:
+                kept.append(box)
+                active.append(box)
+        boxes = kept
+    return sorted(boxes)
+
+def widen_bounds(bounds, other):
+    '''
+    Widens inclusive [min_row, min_column, max_row, max_column] bounds in place to cover other.
+    '''
+    bounds[0] = min(bounds[0], other[0])
+    bounds[1] = min(bounds[1], other[1])
+    bounds[2] = max(bounds[2], other[2])
+    bounds[3] = max(bounds[3], other[3])
+
+def bounds_overlap(first, second):
+    '''
+    Checks if two inclusive [min_row, min_column, max_row, max_column] boxes share a cell.
+    '''
+    return (first[0] <= second[2] and second[0] <= first[2] and
+            first[1] <= second[3] and second[1] <= first[3])
+
+def clip_bounds(bounds, start_pos, end_pos):
+    '''
+    Clips an inclusive [min_row, min_column, max_row, max_column] box to lie between start_pos and
+    end_pos (exclusive).
+    '''
+    return [max(bounds[0], start_pos[0]), max(bounds[1], start_pos[1]),
+            min(bounds[2], end_pos[0] - 1), min(bounds[3], end_pos[1] - 1)]
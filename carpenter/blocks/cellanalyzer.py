@@ -15,6 +15,12 @@ def is_empty_cell(cell):
     '''
     return cell == None or (isinstance(cell, basestring) and not cell)
 
+def is_blank_cell(cell):
+    '''
+    Checks for empty cells or strings holding only whitespace.
+    '''
+    return cell == None or (isinstance(cell, basestring) and not cell.strip())
+
 def is_text_cell(cell):
     '''
     Checks for non-empty strings.
@@ -53,6 +59,20 @@ def check_cell_type(cell, cell_type):
     else:
         return isinstance(cell, cell_type)
 
+def is_plain_cell(cell):
+    '''
+    Checks if auto_convert_cell would only strip the cell (or leave it as is) without raising any
+    flags or recording units. This runs the same checks as the string conversion without building
+    any conversions.
+    '''
+    if cell == None or isinstance(cell, (int, float)):
+        return True
+    if not isinstance(cell, basestring):
+        return False
+    return not (allregex.control_wrapping_regex.search(cell) or
+                allregex.contains_numerical_regex.search(cell) or
+                allregex.bool_regex.search(cell))
+
 def auto_convert_cell_no_flags(cell, units=None, parens_as_neg=True):
     '''
     Performs a first step conversion of the cell to check
@@ -163,7 +183,7 @@ def auto_convert_numeric_string_cell(flagable, cell_str, position, worksheet, fl
             flagable.flag_change(flags, flag_level, position, worksheet)
             return int(cell_str)
         else:
-            flagable.flag_change(flags, flag_level, worksheet, position)
+            flagable.flag_change(flags, flag_level, position, worksheet)
             return float(cell_str)
     def numerify_percentage_str(cell_str, flag_level='minor', flag_text=""):
         flagable.flag_change(flags, flag_level, position, worksheet)
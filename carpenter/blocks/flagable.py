@@ -39,7 +39,9 @@ class Flagable(object):
         'failed-millions-convert' : "Unable to convert numeric string ending in 'M' to numeric",
         'failed-convert-numeric-string' : "Unable to convert string containing numeric to pure numeric",
         'skipped-row': "Row skipped by input request",
-        'skipped-column': "Column skipped by input request"
+        'skipped-column': "Column skipped by input request",
+        'trimmed-rows': "Trimmed %d trailing blank rows",
+        'trimmed-columns': "Trimmed %d trailing blank columns"
     }
 
     # Give FLAGS a default error code, in case someone misspells an input
@@ -84,3 +86,6 @@ class Flagable(object):
             if flag_level > worst_flag_level:
                 worst_flag_level = flag_level
         return self.FLAG_LEVEL_CODES[worst_flag_level]
+
+# Flags are pickled by the name of their class, so it must also be reachable from the module
+FlagLevelTuple = Flagable.FlagLevelTuple
@@ -0,0 +1,115 @@
+import bisect
+
+class FlagIndex(object):
+    '''
+    Indexes the flags of a worksheet by location so the flags inside a block can be found without
+    checking every flag of the worksheet. The flags of each level are kept sorted by row, so a
+    block only looks at the flags within its rows before filtering them by column.
+
+    The flags dictionary keeps being appended to as blocks are validated, so each level is brought
+    up to date when it's read. New flags are added to the index, while a level whose list was
+    replaced or had flags removed is indexed again from scratch.
+
+    Args:
+        flags: The {level: [flags]} dictionary of a worksheet.
+    '''
+    def __init__(self, flags):
+        self.flags = flags
+        self._levels = {}
+
+    def related_flags(self, level, block):
+        '''
+        Gets the flags of level related to block (see TableBlock.flag_is_related), in the order
+        they were raised.
+        '''
+        level_index = self._level_index(level)
+        if level_index == None:
+            return []
+        return level_index.related_flags(block)
+
+    def has_related_flags(self, level, block):
+        '''
+        Checks if any flag of level is related to block, stopping at the first one found.
+        '''
+        level_index = self._level_index(level)
+        return level_index != None and level_index.has_related_flags(block)
+
+    def _level_index(self, level):
+        level_flags = self.flags.get(level)
+        if not level_flags:
+            return None
+        level_index = self._levels.get(level)
+        if level_index == None or not level_index.update(level_flags):
+            level_index = self._levels[level] = _LevelIndex(level_flags)
+        return level_index
+
+class _LevelIndex(object):
+    '''
+    The flags of a single level sorted by row. Flags located at a (row#, column#) cell are kept in
+    rows and cells, and any other flag is kept in unlocated and checked against every block.
+    '''
+    def __init__(self, level_flags):
+        self.level_flags = level_flags
+        self.count = 0
+        self.last = None
+        self.rows = []
+        self.cells = []
+        self.unlocated = []
+        self.update(level_flags)
+
+    def update(self, level_flags):
+        '''
+        Indexes flags appended to level_flags since the last update.
+
+        Returns:
+            False if level_flags was replaced or had flags removed, in which case it must be
+            indexed again.
+        '''
+        count = self.count
+        if (level_flags is not self.level_flags or len(level_flags) < count or
+                (count and level_flags[count - 1] is not self.last)):
+            return False
+        if len(level_flags) == count:
+            return True
+        rows = self.rows
+        cells = self.cells
+        in_order = True
+        for order in xrange(count, len(level_flags)):
+            flag = level_flags[order]
+            location = flag.location
+            if (isinstance(location, (tuple, list)) and len(location) == 2 and
+                    isinstance(location[0], (int, long)) and isinstance(location[1], (int, long))):
+                if rows and location[0] < rows[-1]:
+                    in_order = False
+                rows.append(location[0])
+                cells.append((location[1], order, flag))
+            else:
+                self.unlocated.append((order, flag))
+        if not in_order:
+            # Sorting is stable, so flags of the same row stay in the order they were raised
+            row_cells = sorted(zip(rows, cells), key=lambda row_cell: row_cell[0])
+            self.rows = [row for row, _ in row_cells]
+            self.cells = [cell for _, cell in row_cells]
+        self.count = len(level_flags)
+        self.last = level_flags[-1]
+        return True
+
+    def _iter_related(self, block):
+        start, end = block.start, block.end
+        worksheet = block.worksheet
+        first = bisect.bisect_left(self.rows, start[0])
+        last = bisect.bisect_left(self.rows, end[0], first)
+        for column_index, order, flag in self.cells[first:last]:
+            if start[1] <= column_index < end[1] and flag.worksheet == worksheet:
+                yield order, flag
+        for order, flag in self.unlocated:
+            if block.flag_is_related(flag):
+                yield order, flag
+
+    def related_flags(self, block):
+        return [flag for _, flag in sorted(self._iter_related(block))]
+
+    def has_related_flags(self, block):
+        for _ in self._iter_related(block):
+            return True
+        return False
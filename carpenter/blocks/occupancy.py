@@ -0,0 +1,67 @@
+# NumPy is optional -- callers should check numpy is not None before using these helpers
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from sparsetable import SparseRow, nonempty_columns
+from paddedtable import PaddedRow
+
+def occupancy_array(table, start_pos, end_pos):
+    '''
+    Builds a boolean array which is True wherever the table holds a non-empty cell between start_pos
+    and end_pos (exclusive). Cells missing from short rows are treated as empty.
+    '''
+    occupied = numpy.zeros((max(end_pos[0] - start_pos[0], 0),
+                            max(end_pos[1] - start_pos[1], 0)), dtype=bool)
+    for row_offset, row_index in enumerate(xrange(start_pos[0], end_pos[0])):
+        row = table[row_index]
+        if isinstance(row, (SparseRow, PaddedRow)):
+            columns = [column_index - start_pos[1] for column_index in
+                       nonempty_columns(row, start_pos[1], end_pos[1])]
+            occupied[row_offset, columns] = True
+        else:
+            cells = row[start_pos[1]:end_pos[1]]
+            if cells:
+                occupied[row_offset, :len(cells)] = [cell is not None and cell != ''
+                                                     for cell in cells]
+    return occupied
+
+def first_true_cell(array, start_row=0):
+    '''
+    Finds the first True cell of a 2D boolean array in row major order, starting at start_row. Rows
+    are checked in chunks which double in size so that the work stays proportional to the rows
+    actually passed over.
+
+    Returns:
+        The (row, column) of the cell, or None if no cell is True.
+    '''
+    num_rows, num_columns = array.shape
+    row = start_row
+    chunk = 16
+    while row < num_rows and num_columns:
+        stop = min(num_rows, row + chunk)
+        flat = array[row:stop].ravel()
+        index = flat.argmax()
+        if flat[index]:
+            return row + int(index) // num_columns, int(index) % num_columns
+        row = stop
+        chunk *= 2
+    return None
+
+def leading_true_rows(array):
+    '''
+    Counts how many rows at the top of a 2D boolean array are entirely True. Like first_true_cell
+    this works through the rows in doubling chunks.
+    '''
+    num_rows = array.shape[0]
+    row = 0
+    chunk = 16
+    while row < num_rows:
+        stop = min(num_rows, row + chunk)
+        complete_rows = array[row:stop].all(axis=1)
+        if not complete_rows.all():
+            return row + int(complete_rows.argmin())
+        row = stop
+        chunk *= 2
+    return num_rows
@@ -0,0 +1,112 @@
+import bisect
+from array import array
+
+def _is_formatted(original, conversion):
+    '''
+    Checks if original is exactly the text form of a converted number or boolean, in which case it
+    can be rebuilt from the conversion instead of being stored.
+    '''
+    return (isinstance(original, unicode) and isinstance(conversion, (int, long, float)) and
+            original == unicode(repr(conversion)))
+
+class OriginalValues(object):
+    '''
+    A compact side table of the original values of cells which were converted in place. Cells are
+    recorded by their position flattened into a single integer. Cells whose original text can be
+    rebuilt from their converted value (such as u'12' becoming 12) only cost one array entry, while
+    the rest keep their original value in a parallel list. Preprocessing must record cells in row
+    major order so both arrays stay sorted and can be searched with bisect.
+
+    Cells which are replaced again after preprocessing (by block repairs) are kept in a small dict.
+
+    Args:
+        num_columns: The width of the table, used to flatten positions.
+    '''
+    def __init__(self, num_columns):
+        self.num_columns = max(num_columns, 1)
+        self._positions = array('l')
+        self._values = []
+        self._formatted = array('l')
+        self._replaced = {}
+
+    def _flatten(self, row_index, column_index):
+        return row_index * self.num_columns + column_index
+
+    def record(self, row_index, column_index, original, conversion):
+        '''
+        Records the original value of a cell converted during preprocessing.
+
+        Returns:
+            True if the conversion changed the cell and should be written back.
+        '''
+        if type(original) is type(conversion) and original == conversion:
+            return False
+        position = self._flatten(row_index, column_index)
+        if _is_formatted(original, conversion):
+            self._formatted.append(position)
+        else:
+            self._positions.append(position)
+            self._values.append(original)
+        return True
+
+    def record_replaced(self, row_index, column_index, cell):
+        '''
+        Records that a cell currently holding cell is about to be replaced after preprocessing.
+        '''
+        key = (row_index, column_index)
+        if key not in self._replaced:
+            self._replaced[key] = self.original(row_index, column_index, cell)
+
+    def set_original(self, row_index, column_index, value):
+        '''
+        Replaces the recorded original value of a cell, such as when the input cell is edited.
+        '''
+        self._replaced[(row_index, column_index)] = value
+
+    def replaced_cells(self):
+        '''
+        Returns a copy of {(row#, column#): original} of the cells replaced after preprocessing.
+        '''
+        return dict(self._replaced)
+
+    def set_replaced_cells(self, replaced):
+        '''
+        Sets the cells replaced after preprocessing back to a copy taken by replaced_cells.
+        '''
+        self._replaced = dict(replaced)
+
+    def widen(self, num_columns):
+        '''
+        Changes the table width used to flatten positions, such as after longer rows are appended.
+        Flattening keeps row major order, so recorded positions stay sorted.
+        '''
+        num_columns = max(num_columns, 1)
+        if num_columns == self.num_columns:
+            return
+        for positions in (self._positions, self._formatted):
+            for index, position in enumerate(positions):
+                positions[index] = (position // self.num_columns * num_columns +
+                                    position % self.num_columns)
+        self.num_columns = num_columns
+
+    def original(self, row_index, column_index, cell):
+        '''
+        Gets the original value of the cell at (row_index, column_index) which currently holds cell.
+        '''
+        key = (row_index, column_index)
+        if key in self._replaced:
+            return self._replaced[key]
+        position = self._flatten(row_index, column_index)
+        index = bisect.bisect_left(self._positions, position)
+        if index < len(self._positions) and self._positions[index] == position:
+            return self._values[index]
+        index = bisect.bisect_left(self._formatted, position)
+        if index < len(self._formatted) and self._formatted[index] == position:
+            return unicode(repr(cell))
+        return cell
+
+    def changed_count(self):
+        '''
+        Returns the number of cells changed during preprocessing.
+        '''
+        return len(self._positions) + len(self._formatted)
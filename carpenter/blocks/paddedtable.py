@@ -0,0 +1,138 @@
+import collections
+
+class PaddedRow(collections.MutableSequence):
+    '''
+    A fixed length view of a table row. Positions past the end of the underlying row read as None
+    and cells past the view's length are hidden, so a ragged or overly long row can be treated as
+    if it had been padded or truncated without copying or extending it.
+
+    Setting a non-None value past the end of the underlying row extends that row up to the new
+    cell, so only rows which are actually written to ever pay for padding.
+
+    Args:
+        row: The underlying list of cells.
+        length: The number of columns the view reports.
+    '''
+    def __init__(self, row, length):
+        self.row = row
+        self.length = length
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self.length
+        if index < 0 or index >= self.length:
+            raise IndexError("PaddedRow index out of range")
+        return index
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return [self[column_index] for column_index in xrange(start, stop, step)]
+            cells = list(self.row[start:stop])
+            cells.extend([None] * (stop - start - len(cells)))
+            return cells
+        index = self._check_index(index)
+        return self.row[index] if index < len(self.row) else None
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            for column_index, cell in zip(xrange(*index.indices(self.length)), value):
+                self[column_index] = cell
+            return
+        index = self._check_index(index)
+        if index < len(self.row):
+            self.row[index] = value
+        elif value is not None:
+            self.row.extend([None] * (index - len(self.row)))
+            self.row.append(value)
+
+    def __delitem__(self, index):
+        raise NotImplementedError("Cannot delete from a PaddedRow")
+
+    def insert(self, index, value):
+        raise NotImplementedError("Cannot insert into a PaddedRow")
+
+    def __iter__(self):
+        stored = min(len(self.row), self.length)
+        for column_index in xrange(stored):
+            yield self.row[column_index]
+        for _ in xrange(self.length - stored):
+            yield None
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'PaddedRow(%d, %r)' % (self.length, self.row)
+
+    def stored_length(self):
+        '''
+        Returns the number of leading cells which come from the underlying row.
+        '''
+        return min(len(self.row), self.length)
+
+class PaddedTable(list):
+    '''
+    A rectangular view of a 2D table. The view is a list holding the first num_rows rows of the
+    table, where any row which isn't exactly num_columns long is wrapped in a PaddedRow. Rows are
+    not copied, so the original table is never padded or trimmed, and full length rows are held
+    as is to keep their cell access at list speed.
+
+    Args:
+        table: The 2D table to view.
+        num_rows: The number of leading rows to keep. Defaults to every row.
+        num_columns: The length of every row. Defaults to the length of the longest row.
+    '''
+    def __init__(self, table, num_rows=None, num_columns=None):
+        list.__init__(self)
+        if num_rows == None:
+            num_rows = len(table)
+        if num_columns == None:
+            num_columns = max(len(table[row_index]) for row_index in xrange(num_rows)
+                              ) if num_rows else 0
+        self.num_columns = num_columns
+        for row_index in xrange(num_rows):
+            row = table[row_index]
+            self.append(row if len(row) == num_columns else PaddedRow(row, num_columns))
+
+    def extend_rows(self, rows):
+        '''
+        Adds rows to the end of the view, wrapping any which aren't num_columns long.
+        '''
+        num_columns = self.num_columns
+        self.extend(row if len(row) == num_columns else PaddedRow(row, num_columns)
+                    for row in rows)
+
+    def widen(self, num_columns):
+        '''
+        Grows the length of every row of the view to num_columns. Rows which were held as is are
+        wrapped in a PaddedRow, so this visits every row once.
+        '''
+        if num_columns <= self.num_columns:
+            return
+        for row_index, row in enumerate(self):
+            if isinstance(row, PaddedRow):
+                row.length = max(row.length, num_columns)
+            elif len(row) != num_columns:
+                self[row_index] = PaddedRow(row, num_columns)
+        self.num_columns = num_columns
+
+def unpadded_cells(row):
+    '''
+    Yields the cells of a row which are backed by real data, skipping the None cells a PaddedRow
+    reports past the end of its underlying row.
+    '''
+    if isinstance(row, PaddedRow):
+        cells = row.row
+        for column_index in xrange(row.stored_length()):
+            yield cells[column_index]
+    else:
+        for cell in row:
+            yield cell
@@ -0,0 +1,57 @@
+def copy_flags(flags):
+    '''
+    Copies a flags dictionary along with its lists of flags, which are appended to in place.
+    '''
+    return dict((level, list(level_flags)) for level, level_flags in flags.iteritems())
+
+def copy_deferred(deferred_by_table):
+    '''
+    Copies the deferred conversions of each worksheet, whose rows are emptied in place as they are
+    committed.
+    '''
+    if deferred_by_table == None:
+        return None
+    return [dict((row_index, dict(deferred_row))
+                 for row_index, deferred_row in deferred.iteritems())
+            for deferred in deferred_by_table]
+
+class PreprocessedSnapshot(object):
+    '''
+    Holds the preprocessed state of every worksheet of a TableAnalyzer so that block detection can
+    be run several times from the same conversions (see TableAnalyzer.snapshot).
+
+    The converted tables aren't copied. Instead a journal is added to the TableSummary of each
+    worksheet, which every change to a converted cell passes through, so the snapshot only keeps
+    the old values of the cells changed after it was taken. Flags, units and deferred conversions
+    are small next to the tables and are copied outright.
+
+    Args:
+        summaries: The TableSummary of each worksheet.
+        flags_by_table: The flags of each worksheet.
+        units_by_table: The units of each worksheet.
+        deferred_by_table: The deferred conversions of each worksheet, or None.
+        originals_by_table: The OriginalValues of each worksheet, which may be None.
+        edit_count: The number of input edits made to the analyzer so far.
+    '''
+    def __init__(self, summaries, flags_by_table, units_by_table, deferred_by_table,
+                 originals_by_table, edit_count):
+        self.summaries = list(summaries)
+        self.flags_by_table = [copy_flags(flags) for flags in flags_by_table]
+        self.units_by_table = [dict(units) for units in units_by_table]
+        self.deferred_by_table = copy_deferred(deferred_by_table)
+        self.replaced_by_table = [None if originals == None else originals.replaced_cells()
+                                  for originals in originals_by_table]
+        self.edit_count = edit_count
+        self.journals = []
+        for summary in summaries:
+            journal = {}
+            summary.journals.append(journal)
+            self.journals.append(journal)
+
+    def release(self):
+        '''
+        Stops journaling changes for the snapshot, after which it can no longer be restored.
+        '''
+        for summary, journal in zip(self.summaries, self.journals or []):
+            summary.journals = [other for other in summary.journals if other is not journal]
+        self.journals = None
@@ -0,0 +1,277 @@
+import bisect
+import collections
+from cellanalyzer import is_empty_cell
+from paddedtable import PaddedRow
+
+class SparseRow(collections.MutableSequence):
+    '''
+    A fixed length table row which only stores the cells that hold a value. Any position without a
+    stored value reads as None, so the row can stand in for a list of cells anywhere a table row is
+    expected while only paying for its non-empty cells.
+
+    Args:
+        length: The number of columns the row reports.
+        cells: Optional {column#: value} of the row's stored cells.
+    '''
+    def __init__(self, length=0, cells=None):
+        self._length = length
+        self._cells = {}
+        # Sorted stored column indices, rebuilt lazily after a column is added or removed
+        self._columns = None
+        if cells:
+            for column_index, value in cells.iteritems():
+                self[column_index] = value
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("SparseRow index out of range")
+        return index
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._cells.get(column_index)
+                    for column_index in xrange(*index.indices(self._length))]
+        return self._cells.get(self._check_index(index))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            for column_index, cell in zip(xrange(*index.indices(self._length)), value):
+                self[column_index] = cell
+            return
+        index = self._check_index(index)
+        if value is None:
+            if index in self._cells:
+                del self._cells[index]
+                self._columns = None
+        else:
+            if index not in self._cells:
+                self._columns = None
+            self._cells[index] = value
+
+    def __delitem__(self, index):
+        raise NotImplementedError("Cannot delete from a SparseRow")
+
+    def insert(self, index, value):
+        '''
+        Only appending is supported as inserting would shift every stored column.
+        '''
+        if index < self._length:
+            raise NotImplementedError("Can only append to a SparseRow")
+        self._length += 1
+        self[self._length - 1] = value
+
+    def extend(self, values):
+        for value in values:
+            self.insert(self._length, value)
+
+    def resize(self, length):
+        '''
+        Changes the reported length of the row without touching any cells, dropping any stored
+        cells which fall past the new length.
+        '''
+        if length < self._length:
+            for column_index in self.stored_columns(length):
+                del self._cells[column_index]
+            self._columns = None
+        self._length = length
+
+    def __iter__(self):
+        cells = self._cells
+        for column_index in xrange(self._length):
+            yield cells.get(column_index)
+
+    def __eq__(self, other):
+        if isinstance(other, SparseRow):
+            return self._length == other._length and self._cells == other._cells
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'SparseRow(%d, %r)' % (self._length, self._cells)
+
+    def stored_columns(self, start=0, end=None):
+        '''
+        Finds the sorted column indices between start and end (exclusive) that hold a value.
+        '''
+        if self._columns == None:
+            self._columns = sorted(self._cells)
+        lower = bisect.bisect_left(self._columns, start) if start > 0 else 0
+        upper = (bisect.bisect_left(self._columns, end) if end != None
+                 else len(self._columns))
+        return self._columns[lower:upper]
+
+    def stored_count(self):
+        '''
+        Returns the number of cells stored in the row.
+        '''
+        return len(self._cells)
+
+class SparseTable(collections.Sequence):
+    '''
+    A 2D table made of SparseRows. Every row has the same length, so the table never needs to be
+    squarified, and memory use scales with the number of non-empty cells plus the number of rows
+    rather than with the full area of the table.
+
+    Args:
+        num_rows: The number of rows in the table.
+        num_columns: The number of columns in every row.
+        cells: Optional {(row#, column#): value} of the table's stored cells.
+    '''
+    def __init__(self, num_rows=0, num_columns=0, cells=None):
+        self._rows = [SparseRow(num_columns) for _ in xrange(num_rows)]
+        self._num_columns = num_columns
+        if cells:
+            for (row_index, column_index), value in cells.iteritems():
+                self._rows[row_index][column_index] = value
+
+    @classmethod
+    def from_cells(cls, cells, num_rows=None, num_columns=None):
+        '''
+        Builds a table from a {(row#, column#): value} dictionary. The table size defaults to the
+        smallest size holding every cell.
+        '''
+        if num_rows == None:
+            num_rows = max(row_index for row_index, _ in cells) + 1 if cells else 0
+        if num_columns == None:
+            num_columns = max(column_index for _, column_index in cells) + 1 if cells else 0
+        return cls(num_rows, num_columns, cells)
+
+    @classmethod
+    def from_rows(cls, rows):
+        '''
+        Builds a table from a 2D list of rows, keeping only the cells which are not None. Shorter
+        rows are treated as if they were padded with None.
+        '''
+        num_columns = max(len(row) for row in rows) if rows else 0
+        table = cls(0, num_columns)
+        for row in rows:
+            table._rows.append(SparseRow(num_columns, dict((column_index, cell)
+                for column_index, cell in enumerate(row) if cell is not None)))
+        return table
+
+    def empty_copy(self):
+        '''
+        Creates a table with the same dimensions and no stored cells.
+        '''
+        return SparseTable(len(self._rows), self._num_columns)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        return self._rows[index]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __repr__(self):
+        return 'SparseTable(%d, %d, %r)' % (len(self._rows), self._num_columns,
+                                            dict(self.iter_cells()))
+
+    @property
+    def num_columns(self):
+        return self._num_columns
+
+    def resize(self, num_rows, num_columns):
+        '''
+        Changes the size of the table, dropping any stored cells which fall outside of it.
+        '''
+        if num_rows < len(self._rows):
+            del self._rows[num_rows:]
+        else:
+            self._rows.extend(SparseRow(self._num_columns)
+                              for _ in xrange(num_rows - len(self._rows)))
+        for row in self._rows:
+            row.resize(num_columns)
+        self._num_columns = num_columns
+
+    def extend_rows(self, rows):
+        '''
+        Adds 2D list rows to the end of the table, keeping only the cells which are not None. Rows
+        must not be longer than the table is wide.
+        '''
+        for row in rows:
+            if len(row) > self._num_columns:
+                raise IndexError("Row is longer than the SparseTable is wide")
+            self._rows.append(SparseRow(self._num_columns, dict((column_index, cell)
+                for column_index, cell in enumerate(row) if cell is not None)))
+
+    def iter_cells(self):
+        '''
+        Yields ((row#, column#), value) for every stored cell in row major order.
+        '''
+        for row_index, row in enumerate(self._rows):
+            for column_index in row.stored_columns():
+                yield (row_index, column_index), row[column_index]
+
+    def stored_count(self):
+        '''
+        Returns the number of cells stored in the table.
+        '''
+        return sum(row.stored_count() for row in self._rows)
+
+    def to_rows(self):
+        '''
+        Copies the table into a dense 2D list of rows.
+        '''
+        return [list(row) for row in self._rows]
+
+class LazySparseTable(collections.Sequence):
+    '''
+    A table of SparseRows which are only created when first accessed, so building one costs the
+    same no matter how many rows it reports. Useful as scratch space, such as used cell tracking,
+    over a small part of a large table.
+
+    Args:
+        num_rows: The number of rows in the table.
+        num_columns: The number of columns in every row.
+    '''
+    def __init__(self, num_rows, num_columns):
+        self._rows = {}
+        self._num_rows = num_rows
+        self._num_columns = num_columns
+
+    def __len__(self):
+        return self._num_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row_index] for row_index in xrange(*index.indices(self._num_rows))]
+        if index < 0:
+            index += self._num_rows
+        if index < 0 or index >= self._num_rows:
+            raise IndexError("LazySparseTable index out of range")
+        row = self._rows.get(index)
+        if row is None:
+            row = self._rows[index] = SparseRow(self._num_columns)
+        return row
+
+    @property
+    def num_columns(self):
+        return self._num_columns
+
+def nonempty_columns(row, start=0, end=None):
+    '''
+    Yields the column indices between start and end (exclusive) which hold non-empty cells. Sparse
+    rows only visit their stored cells while list rows are scanned cell by cell. Padded rows are
+    only scanned up to the end of their underlying row.
+    '''
+    end = len(row) if end == None else min(end, len(row))
+    if isinstance(row, PaddedRow):
+        row = row.row
+        end = min(end, len(row))
+    if isinstance(row, SparseRow):
+        for column_index in row.stored_columns(start, end):
+            if not is_empty_cell(row[column_index]):
+                yield column_index
+    else:
+        for column_index in xrange(start, end):
+            if not is_empty_cell(row[column_index]):
+                yield column_index
@@ -0,0 +1,44 @@
+import sys
+
+class StringPool(object):
+    '''
+    Keeps one string object for each distinct text value converted by an analyzer, so that repeated
+    titles (such as a department name on thousands of rows) are shared by every converted cell and
+    by the titles of every row table built from them. The builtin intern only takes byte strings,
+    while most worksheets hold unicode, so the pool is a plain dict held by the analyzer and freed
+    along with it. Strings are pooled by type as well as value, as an ascii str equals the same
+    unicode string but shouldn't be swapped for it.
+    '''
+    def __init__(self):
+        self._strings = {}
+        self.bytes_saved = 0
+
+    def intern(self, value):
+        '''
+        Gets the pooled string equal to value, adding value to the pool if it's new. The size of
+        each equal but separate string that's swapped for a pooled one is added to bytes_saved.
+        '''
+        pooled = self._strings.setdefault((type(value), value), value)
+        if pooled is not value:
+            self.bytes_saved += sys.getsizeof(value)
+        return pooled
+
+    def intern_rows(self, rows):
+        '''
+        Swaps every string cell of a list of rows for its pooled string, such as for rows converted
+        with another pool.
+        '''
+        strings = self._strings
+        for row in rows:
+            for column_index, cell in enumerate(row):
+                if isinstance(cell, basestring):
+                    pooled = strings.setdefault((type(cell), cell), cell)
+                    if pooled is not cell:
+                        self.bytes_saved += sys.getsizeof(cell)
+                        row[column_index] = pooled
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __contains__(self, value):
+        return (type(value), value) in self._strings
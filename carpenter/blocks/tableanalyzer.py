@@ -1,8 +1,27 @@
+import re
 import sys
-from datawrap.tablewrap import TableTranspose, squarify_table
+import collections
+from datawrap.tablewrap import TableTranspose
 from block import TableBlock, InvalidBlockError
 from flagable import Flagable
-from cellanalyzer import is_empty_cell, is_text_cell, is_num_cell, auto_convert_cell
+from cellanalyzer import (is_empty_cell, is_blank_cell, is_text_cell, is_num_cell, is_plain_cell,
+    get_cell_type, auto_convert_cell)
+from bounds import merge_overlapping_bounds, widen_bounds, bounds_overlap, clip_bounds
+from sparsetable import SparseTable, SparseRow, LazySparseTable, nonempty_columns
+from paddedtable import PaddedTable, PaddedRow, unpadded_cells
+from originals import OriginalValues
+from tablesummary import TableSummary
+from snapshot import PreprocessedSnapshot, copy_flags, copy_deferred
+from stringpool import StringPool
+from flagindex import FlagIndex
+from carpenter.regex import allregex
+import occupancy
+import bands
+
+# The (row#, column#) cell a block search started from, the inclusive [min_row, min_column, max_row,
+# max_column] box of the cells its walks read and a list of boxes of the cells it only peeked at
+# outside of them (see _find_valid_block)
+BlockSearch = collections.namedtuple('BlockSearch', ['found_at', 'searched', 'peeked'])
 
 class TableAnalyzer(Flagable):
     '''
@@ -11,54 +30,234 @@ class TableAnalyzer(Flagable):
 
     The analyzer performs basic data conversions from known string patterns into numeric values.
     It also flags these changes and keeps all flag level changes or problems stored in
-    flags_by_table.
+    flags_by_table. A TableSummary of each processed worksheet is kept in summaries_by_table and
+    updated as blocks repair cells. The block search used for each worksheet, and why it was
+    chosen, is recorded in block_modes_by_table.
 
-    Note that the input table is squarified so that all rows are the same size. This affects the
-    input table as the original data is not copied.
+    Note that each worksheet is analyzed through a PaddedTable view, which reads short rows as if
+    they were padded with None, and also trims trailing blank rows and columns when
+    trim_blank_edges is set. The input tables are neither copied nor modified. The number of rows
+    and columns trimmed from each worksheet is kept in trimmed_by_table and reported as a minor
+    flag. Worksheets given as SparseTables (or all
+    worksheets when sparse is set) are analyzed without ever being expanded into dense rows. When
+    preprocess or generate_blocks is given regions, only those rectangles of the worksheets are
+    analyzed and the rectangle used for each worksheet is kept in regions_by_table. Converted text
+    cells share one string per distinct value through string_pool, which also counts the bytes
+    this saves, so row tables built from the blocks share their titles as well.
 
     Args:
         tables: The list of 2D tables holding the csv or excel data
         assume_complete_blocks: Optimizes block loopups by not allowing titles to be extended.
-            Blocks should be perfectly dense to be found when active.
+            Blocks should be perfectly dense to be found when active. Set to 'auto' to choose per
+            worksheet based on a cheap layout check.
         parens_as_neg: Converts numerics surrounded by parens to negative values.
         skippable_rows: Takes {worksheet#: [row#, row#, ...]} for rows that should be ignored.
         skippable_columns: Takes {worksheet#: [columnd#, column#, ...]} for cols that should be ignored.
         max_title_rows: Defines the maximum length in rows for header titles. This prevents title
             expansion when values appear as titles.
+        sparse: Converts every worksheet into a SparseTable before analysis so that preprocessing,
+            block detection and blocks only visit non-empty cells. The input tables are copied
+            rather than squarified when active.
+        use_numpy: Locates blocks with NumPy array operations when assume_complete_blocks is active
+            and numpy is installed. Disable to always use the cell by cell search.
+        trim_blank_edges: Leaves trailing rows and columns holding only None or whitespace cells
+            out of the analyzed worksheets. Off by default as the block search extends blocks
+            across blank cells up to the edge of the worksheet, so blocks bordering the trimmed
+            rows or columns may be found with different bounds.
+        in_place: Writes cell conversions back into the input rows rather than building a second
+            copy of each worksheet. Only the original values of changed cells are kept, in a
+            compact OriginalValues side table per worksheet (see original_cell).
+        lazy_conversion: Splits analysis into two phases. Preprocessing only classifies cells,
+            skipping the full conversion for blanks, numbers and plain text and holding back the
+            flags and units of every other cell. Those are only added to flags_by_table and
+            units_by_table for cells inside accepted blocks, or when read through converted_cell.
+        processes: Splits worksheets of at least BAND_MIN_CELLS cells into this many bands which
+            are preprocessed and searched for blocks in a pool of worker processes (see
+            _find_band_blocks). Only dense worksheets analyzed in full, without in_place or
+            lazy_conversion, are split. Defaults to analyzing every worksheet serially.
     '''
+    BAND_MIN_CELLS = 250000
+
     def __init__(self, tables, assume_complete_blocks=False, parens_as_neg=True,
             blank_repeat_threshold=3, skippable_rows=None, skippable_columns=None,
-            max_title_rows=sys.maxint / 2):
-        self.raw_tables = tables
-        squarify_table(self.raw_tables)
+            max_title_rows=sys.maxint / 2, sparse=False, use_numpy=True,
+            trim_blank_edges=False, in_place=False, lazy_conversion=False, processes=None):
+        if sparse:
+            tables = [table if isinstance(table, SparseTable) else SparseTable.from_rows(table)
+                      for table in tables]
+        self.raw_tables = []
+        self.trimmed_by_table = []
+        for table in tables:
+            if trim_blank_edges:
+                table, trimmed = self.trim_worksheet(table)
+            else:
+                trimmed = (0, 0)
+                if not isinstance(table, SparseTable):
+                    table = PaddedTable(table)
+            self.raw_tables.append(table)
+            self.trimmed_by_table.append(trimmed)
         self.processed_tables = None
+        self.regions = None
+        self.regions_by_table = None
         self.flags_by_table = None
         self.units_by_table = None
+        self.summaries_by_table = None
+        self.originals_by_table = None
+        self.deferred_by_table = None
+        self.block_modes_by_table = None
         self.processed_blocks = None
+        self.string_pool = None
+        self._flag_indexes = {}
+        # Set to a dictionary while _build_block should record the flags each block raises
+        self._raised_flags = None
+        # Set to a list while the searches which found no block should be recorded
+        self._rejected_searches = None
+        # The searches of each worksheet which found no block, kept for update_cells
+        self._rejected_by_table = None
         self.blank_repeat_threshold = blank_repeat_threshold
         self.assume_complete_blocks = assume_complete_blocks
         self.parens_as_neg = parens_as_neg
         self.skippable_rows = skippable_rows
         self.skippable_columns = skippable_columns
         self.max_title_rows = int(max_title_rows)
+        self.sparse = sparse
+        self.use_numpy = use_numpy
+        self.trim_blank_edges = trim_blank_edges
+        self.in_place = in_place
+        self.lazy_conversion = lazy_conversion
+        self.processes = processes
+        self.edit_count = 0
 
-    def preprocess(self):
+    def preprocess(self, regions=None):
         '''
         Performs initial cell conversions to standard types. This will strip units, scale numbers,
         and identify numeric data where it's convertible.
+
+        When in_place is set the conversions overwrite the raw tables, so the raw and processed
+        tables share their rows, and the replaced values are kept in originals_by_table.
+
+        Args:
+            regions: Takes {worksheet#: ((start_row, start_column), (end_row, end_column))} of the
+                rectangles to analyze, with exclusive ends. Only the cells inside each rectangle
+                are converted (see preprocess_region) and later searched for blocks, while
+                worksheets without a rectangle are left empty. Optional, defaults to analyzing
+                every cell.
+        '''
+        self._reset_preprocessed(regions)
+        while len(self.processed_tables) < len(self.raw_tables):
+            self._preprocess_next_worksheet()
+        return self.processed_tables
+
+    def snapshot(self):
         '''
+        Takes a snapshot of the preprocessed state of every worksheet, preprocessing any worksheets
+        which haven't been yet. Validating blocks repairs cells of the converted tables and adds
+        flags, so restoring the snapshot lets generate_blocks be run again from the same
+        conversions, such as with another max_title_rows, blank_repeat_threshold or
+        assume_complete_blocks, without converting the worksheets again.
+
+        The converted tables are shared with the snapshot and only the cells changed after it are
+        copied (see PreprocessedSnapshot). A snapshot can be restored any number of times and
+        should be released once it is no longer needed.
+
+        Returns:
+            A PreprocessedSnapshot to pass to restore.
+        '''
+        if self.processed_tables == None:
+            self._reset_preprocessed(None)
+        while len(self.processed_tables) < len(self.raw_tables):
+            self._preprocess_next_worksheet()
+        return PreprocessedSnapshot(self.summaries_by_table, self.flags_by_table,
+                                    self.units_by_table, self.deferred_by_table,
+                                    self.originals_by_table, self.edit_count)
+
+    def restore(self, snapshot):
+        '''
+        Returns the preprocessed state of every worksheet to a snapshot, undoing the cell repairs,
+        flags and units of any blocks generated since. Blocks found since are dropped.
+
+        Args:
+            snapshot: A PreprocessedSnapshot taken by snapshot.
+
+        Raises:
+            ValueError: If the snapshot was released, or if the worksheets were preprocessed again
+                or edited through update_cells or append_rows since the snapshot was taken.
+        '''
+        if (snapshot.journals == None or snapshot.edit_count != self.edit_count or
+                self.summaries_by_table == None or
+                len(self.summaries_by_table) != len(snapshot.summaries) or
+                any(summary is not snapshot_summary for summary, snapshot_summary
+                    in zip(self.summaries_by_table, snapshot.summaries))):
+            raise ValueError("The snapshot no longer matches the preprocessed worksheets")
+        for worksheet, journal in enumerate(snapshot.journals):
+            ptable = self.processed_tables[worksheet]
+            summary = self.summaries_by_table[worksheet]
+            for (row_index, column_index), cell in journal.items():
+                row = ptable[row_index]
+                summary.update_cell(row_index, column_index, row[column_index], cell)
+                row[column_index] = cell
+            journal.clear()
+            self.flags_by_table[worksheet] = copy_flags(snapshot.flags_by_table[worksheet])
+            self.units_by_table[worksheet] = dict(snapshot.units_by_table[worksheet])
+            replaced = snapshot.replaced_by_table[worksheet]
+            if replaced != None:
+                self.originals_by_table[worksheet].set_replaced_cells(replaced)
+        if snapshot.deferred_by_table != None:
+            self.deferred_by_table = copy_deferred(snapshot.deferred_by_table)
+        self.processed_blocks = None
+        self.block_modes_by_table = None
+        self._rejected_by_table = None
+
+    def _reset_preprocessed(self, regions):
+        '''
+        Clears the preprocessed state of every worksheet so that worksheets can be preprocessed one
+        at a time, in order, with _preprocess_next_worksheet.
+        '''
+        self.regions = regions
+        self.regions_by_table = []
         self.processed_tables = []
         self.flags_by_table = []
         self.units_by_table = []
-        for worksheet, rtable in enumerate(self.raw_tables):
-            ptable, flags, units = self.preprocess_worksheet(rtable, worksheet)
-            self.processed_tables.append(ptable)
-            self.flags_by_table.append(flags)
-            self.units_by_table.append(units)
+        self.summaries_by_table = []
+        self.originals_by_table = []
+        self.deferred_by_table = [{} for _ in self.raw_tables] if self.lazy_conversion else None
+        self.string_pool = StringPool()
+        self._flag_indexes = {}
 
-        return self.processed_tables
+    def _preprocess_next_worksheet(self):
+        '''
+        Preprocesses the first worksheet which hasn't been preprocessed yet.
+        '''
+        worksheet = len(self.processed_tables)
+        rtable = self.raw_tables[worksheet]
+        region = self._clip_region(worksheet)
+        self.regions_by_table.append(region)
+        if region != None:
+            originals = None
+            ptable, flags, units = self.preprocess_region(rtable, worksheet, *region)
+            summary = TableSummary(ptable, region[0][0], region[1][0])
+        elif self._uses_bands(worksheet):
+            originals = None
+            ptable, flags, units = self._preprocess_bands(rtable, worksheet)
+            summary = TableSummary(ptable)
+        else:
+            originals = OriginalValues(rtable.num_columns) if self.in_place else None
+            ptable, flags, units = self.preprocess_worksheet(rtable, worksheet, originals)
+            summary = TableSummary(ptable)
+        self._flag_trimmed_edges(flags, worksheet)
+        self.originals_by_table.append(originals)
+        self.processed_tables.append(ptable)
+        self.flags_by_table.append(flags)
+        self.units_by_table.append(units)
+        self.summaries_by_table.append(summary)
+
+    def _is_preprocessed(self, worksheet):
+        '''
+        Checks if a worksheet has been preprocessed, which iter_blocks only does once it reaches it.
+        '''
+        return self.processed_tables != None and worksheet < len(self.processed_tables)
 
-    def generate_blocks(self, assume_complete_blocks=None):
+    def generate_blocks(self, assume_complete_blocks=None, regions=None):
         '''
         Identifies and extracts all blocks from the input tables. These blocks are logical
         identifiers for where related information resides in the original table. Any block can be
@@ -67,79 +266,992 @@ class TableAnalyzer(Flagable):
 
         Args:
             assume_complete_blocks: Optimizes block loopups by not allowing titles to be extended.
-                Blocks should be perfectly dense to be found when active. Optional, defaults to
-                constructor value.
+                Blocks should be perfectly dense to be found when active. Set to 'auto' to choose
+                per worksheet. Optional, defaults to constructor value.
+            regions: Limits the analysis to rectangles of the worksheets as in preprocess, which
+                is run again when given. Optional, defaults to the regions of the last preprocess.
+        '''
+        for _ in self.iter_blocks(assume_complete_blocks, regions):
+            pass
+        return self.processed_blocks
+
+    def iter_blocks(self, assume_complete_blocks=None, regions=None):
+        '''
+        Same as generate_blocks, but yields each block as soon as it is validated rather than
+        returning them all at the end. Worksheets are only preprocessed once the search reaches
+        them, so the first blocks of a large workbook arrive before its later worksheets are
+        converted. The blocks yielded so far are kept in processed_blocks.
+
+        Worksheets which the search hasn't reached yet can still be edited with update_cells and
+        append_rows, as they are converted from their input once reached.
         '''
+        if assume_complete_blocks == None:
+            assume_complete_blocks = self.assume_complete_blocks
+        if regions != None or self.processed_tables == None:
+            self._reset_preprocessed(regions)
+        self.processed_blocks = []
+        self.block_modes_by_table = []
+        self._rejected_by_table = []
+
         # Store this value to restore object settings later
         _track_assume_blocks = self.assume_complete_blocks
         try:
-            if assume_complete_blocks != None:
-                self.assume_complete_blocks = assume_complete_blocks
-            if self.processed_tables == None:
-                self.preprocess()
-            self.processed_blocks = []
-
-            for worksheet in range(len(self.processed_tables)):
+            for worksheet in xrange(len(self.raw_tables)):
+                if not self._is_preprocessed(worksheet):
+                    self._preprocess_next_worksheet()
                 ptable = self.processed_tables[worksheet]
                 flags = self.flags_by_table[worksheet]
                 units = self.units_by_table[worksheet]
+                summary = self.summaries_by_table[worksheet]
 
-                if not self.assume_complete_blocks:
-                    self.fill_in_table(ptable, worksheet, flags)
-
-                self.processed_blocks.extend(self._find_blocks(ptable, worksheet, flags, units,
-                        { 'worksheet': worksheet }))
+                region = self._worksheet_region(worksheet)
+                if assume_complete_blocks == 'auto':
+                    block_mode = self._choose_block_mode(ptable, summary, region)
+                else:
+                    block_mode = { 'assume_complete_blocks': bool(assume_complete_blocks),
+                                   'reason': 'requested' }
+                self.block_modes_by_table.append(block_mode)
 
-            return self.processed_blocks
+                self.assume_complete_blocks = block_mode['assume_complete_blocks']
+                self._rejected_by_table.append([])
+                self._rejected_searches = self._rejected_by_table[worksheet]
+                if region != None:
+                    blocks = self._find_blocks(ptable, worksheet, flags, units,
+                            { 'worksheet': worksheet }, region[0], region[1], summary,
+                            LazySparseTable(len(ptable), ptable.num_columns))
+                elif self._uses_bands(worksheet):
+                    blocks = self._find_band_blocks(worksheet)
+                else:
+                    blocks = self._find_blocks(ptable, worksheet, flags, units,
+                            { 'worksheet': worksheet }, summary=summary)
+                for block in blocks:
+                    self.processed_blocks.append(block)
+                    # Settings are only changed while the search runs, not while the caller does
+                    self.assume_complete_blocks = _track_assume_blocks
+                    self._rejected_searches = None
+                    yield block
+                    self.assume_complete_blocks = block_mode['assume_complete_blocks']
+                    self._rejected_searches = self._rejected_by_table[worksheet]
+                self.assume_complete_blocks = _track_assume_blocks
+                self._rejected_searches = None
         finally:
             # After execution, reset assume_complete_blocks back
             self.assume_complete_blocks = _track_assume_blocks
+            self._rejected_searches = None
+
+    def update_cells(self, worksheet, cells):
+        '''
+        Edits cells of an input worksheet and re-analyzes only the area around them. Each edited
+        cell is grown by blank_repeat_threshold + 1 cells in every direction, and every block or
+        rejected search of the worksheet which read a cell of that area is invalidated, growing the
+        area over the cells it read until no remaining search read any of it. The cells of that
+        area are converted again from their input values (dropping their old flags, units and
+        repairs) and blocks are searched for only inside it, growing it again wherever the new
+        searches read past it (see _reanalyze_areas). Blocks and flags outside the area are kept, so
+        the work scales with the size of the edit rather than the worksheet, and the blocks found
+        match those of a fresh analysis. Blocks of the worksheet are then put in the order a serial
+        search finds them.
+
+        Edited cells must lie within the analyzed worksheet, or its region when preprocessed with
+        regions, so cells of blank edges left out by trim_blank_edges can't be edited. When blocks
+        haven't been generated yet only the edited cells are converted again. Worksheets where no
+        blocks were found are analyzed again in full, as are worksheets whose block mode was chosen
+        with assume_complete_blocks='auto' and would now be chosen differently.
+
+        Args:
+            worksheet: The index of the worksheet to edit.
+            cells: Takes {(row#, column#): value} of the new input values.
+
+        Returns:
+            The list of newly found blocks.
+        '''
+        self.edit_count += 1
+        region = self._worksheet_region(worksheet)
+        if region != None and not all(region[0][0] <= row_index < region[1][0] and
+                                      region[0][1] <= column_index < region[1][1]
+                                      for row_index, column_index in cells):
+            raise ValueError("Edited cells must lie within the worksheet's region")
+        raw_table = self.raw_tables[worksheet]
+        num_rows, num_columns = len(raw_table), raw_table.num_columns
+        if not all(0 <= row_index < num_rows and 0 <= column_index < num_columns
+                   for row_index, column_index in cells):
+            raise ValueError("Edited cells must lie within the worksheet's %d rows and %d columns, "
+                             "which exclude trimmed blank edges" % (num_rows, num_columns))
+        originals = self._worksheet_originals(worksheet)
+        for (row_index, column_index), value in cells.iteritems():
+            if originals != None:
+                originals.set_original(row_index, column_index, value)
+            else:
+                raw_table[row_index][column_index] = value
+        if not self._is_preprocessed(worksheet):
+            return []
+        if self.processed_blocks == None:
+            areas = merge_overlapping_bounds([[row_index, column_index, row_index, column_index]
+                                              for row_index, column_index in cells])
+            area_flags = {}
+            area_units = {}
+            for area in areas:
+                self._reconvert_area(worksheet, area, area_flags, area_units)
+            self._replace_area_flags(worksheet, areas, area_flags, area_units)
+            return []
+
+        if not self._has_table_blocks(worksheet):
+            self.preprocess(self.regions)
+            return [block for block in self.generate_blocks()
+                    if getattr(block, 'worksheet', None) == worksheet]
+
+        ptable = self.processed_tables[worksheet]
+        num_rows = len(ptable)
+        num_columns = ptable.num_columns
+        margin = self.blank_repeat_threshold + 1
+        return self._reanalyze_areas(worksheet, [[max(row_index - margin, 0),
+                                                  max(column_index - margin, 0),
+                                                  min(row_index + margin, num_rows - 1),
+                                                  min(column_index + margin, num_columns - 1)]
+                                                 for row_index, column_index in cells])
+
+    def append_rows(self, worksheet, rows):
+        '''
+        Adds rows to the end of an input worksheet, such as the new lines of a growing csv file,
+        and analyzes only the tail of the worksheet. The new rows are converted on their own and
+        searched for blocks as if they were edited (see update_cells), so every block or rejected
+        search which read up to the old end of the worksheet is searched again with them, as is
+        every search stopped by the old right edge when the new rows widen the worksheet. The
+        blocks found match those of a fresh analysis. A block left open at the old end of the
+        worksheet is extended over the new rows when they plainly continue it instead. Blocks and
+        flags left untouched by the new rows are kept as they are.
+
+        Trailing blank rows trimmed from the worksheet are kept between the old and new rows and
+        the new rows are trimmed in the same way. Rows longer than the worksheet widen it, which
+        visits every row once. When the block mode of the worksheet was chosen with
+        assume_complete_blocks='auto' and the new rows change the choice, the whole worksheet is
+        analyzed again.
+
+        Args:
+            worksheet: The index of the worksheet to append to.
+            rows: The list of new rows. With in_place set these rows are converted in place.
+
+        Returns:
+            The list of newly found blocks, including an open block extended over the new rows.
+        '''
+        if self._worksheet_region(worksheet) != None:
+            raise ValueError("Cannot append rows to a worksheet analyzed by region")
+        self.edit_count += 1
+        table = self.raw_tables[worksheet]
+        rows_trimmed, columns_trimmed = self.trimmed_by_table[worksheet]
+        old_num_rows = len(table)
+        old_num_columns = num_columns = table.num_columns
+        input_columns = max([num_columns + columns_trimmed] + [len(row) for row in rows])
+        if self.trim_blank_edges:
+            content_rows = len(rows)
+            while content_rows > 0 and self._content_length(rows[content_rows - 1]) == 0:
+                content_rows -= 1
+            for row_index in xrange(content_rows):
+                num_columns = self._content_length(rows[row_index], num_columns)
+            if content_rows:
+                new_rows = [[] for _ in xrange(rows_trimmed)] + list(rows[:content_rows])
+                rows_trimmed = len(rows) - content_rows
+            else:
+                new_rows = []
+                rows_trimmed += len(rows)
+            trimmed = (rows_trimmed, input_columns - num_columns)
+        else:
+            num_columns = input_columns
+            new_rows = list(rows)
+            trimmed = (0, 0)
+
+        flags = self.flags_by_table[worksheet] if self._is_preprocessed(worksheet) else None
+        if flags != None:
+            self._unflag_trimmed_edges(flags, worksheet)
+        self.trimmed_by_table[worksheet] = trimmed
+        if isinstance(table, SparseTable):
+            if num_columns > table.num_columns:
+                table.resize(len(table), num_columns)
+            table.extend_rows([row[:num_columns] for row in new_rows])
+        else:
+            table.widen(num_columns)
+            table.extend_rows(new_rows)
+        if flags == None:
+            return []
+        self._flag_trimmed_edges(flags, worksheet)
+        if not new_rows:
+            return []
+        if self.processed_blocks != None and not self._has_table_blocks(worksheet):
+            self.preprocess(self.regions)
+            return [block for block in self.generate_blocks()
+                    if getattr(block, 'worksheet', None) == worksheet]
+
+        ptable = self.processed_tables[worksheet]
+        units = self.units_by_table[worksheet]
+        originals = self._worksheet_originals(worksheet)
+        if originals != None:
+            originals.widen(num_columns)
+        if isinstance(ptable, SparseTable):
+            if ptable is not table:
+                if num_columns > ptable.num_columns:
+                    ptable.resize(len(ptable), num_columns)
+                ptable.extend_rows([[]] * len(new_rows))
+            self._preprocess_sparse_rows(table, ptable, worksheet, flags, units, originals,
+                                         old_num_rows)
+        else:
+            ptable.widen(num_columns)
+            ptable.extend_rows(self._preprocess_rows(table, worksheet, flags, units, originals,
+                                                     old_num_rows))
+        self.summaries_by_table[worksheet].add_rows(old_num_rows)
+        if self.processed_blocks == None:
+            return []
+
+        # A changed block mode leaves _reanalyze_areas to search the whole worksheet again
+        if not self._block_mode_changed(worksheet):
+            block = self._extend_open_block(worksheet, old_num_rows, old_num_columns)
+            if block != None:
+                return [block]
+        # Searches which read past the old end cover the new rows, but searches stopped by the old
+        # right edge don't cover any changed cell
+        areas = [[old_num_rows, 0, len(ptable) - 1, num_columns - 1]]
+        if num_columns > old_num_columns:
+            areas.extend(clip_bounds(search.searched, (0, 0), (len(ptable), num_columns))
+                         for search in self._worksheet_searches(worksheet)
+                         if search.searched[3] >= old_num_columns)
+        return self._reanalyze_areas(worksheet, areas)
+
+    def _extend_open_block(self, worksheet, old_num_rows, old_num_columns):
+        '''
+        Extends the block reaching the old end of a worksheet over its appended rows when they
+        plainly continue that block, so the block doesn't need to be searched for and validated
+        again. This is only the case when no other block or cell lies within blank_repeat_threshold
+        + 1 rows of the old end, no other search read past the old end or, if the worksheet was
+        widened, its old right edge, every new row fills the block's columns (and no others), holds
+        a number and matches the type of the block's last row cell for cell, and no new row or
+        column could be taken for a run of year titles. Validating the whole block would then
+        repair none of the new cells and only raise the type change flags of their own rows.
+
+        Returns:
+            The extended block, or None if the tail of the worksheet must be analyzed again.
+        '''
+        ptable = self.processed_tables[worksheet]
+        summary = self.summaries_by_table[worksheet]
+        margin = self.blank_repeat_threshold + 1
+        tail_blocks = [block for block in self.processed_blocks
+                       if isinstance(block, TableBlock) and block.worksheet == worksheet and
+                       block.end[0] > old_num_rows - margin]
+        if len(tail_blocks) != 1:
+            return None
+        block = tail_blocks[0]
+        if block.end[0] != old_num_rows or block.end[0] - block.start[0] < 2:
+            return None
+        widened = ptable.num_columns > old_num_columns
+        if any(search.searched[2] >= old_num_rows or
+               (widened and search.searched[3] >= old_num_columns)
+               for search in self._worksheet_searches(worksheet) if search is not block.search):
+            return None
+        start_column, end_column = block.start[1], block.end[1]
+        for row_index in xrange(max(old_num_rows - margin, 0), len(ptable)):
+            row_summary = summary.row(row_index)
+            if row_summary.last != None and (row_summary.first < start_column or
+                                             row_summary.last >= end_column):
+                return None
+
+        columns = xrange(start_column, end_column)
+        last_row = ptable[old_num_rows - 1]
+        last_types = [get_cell_type(last_row[column_index]) for column_index in columns]
+        if None in last_types or (int, float) not in last_types:
+            return None
+        top_row = ptable[block.start[0]]
+        for column_index, cell_type in zip(columns, last_types):
+            top_cell = top_row[column_index]
+            # Year titled columns of text may have been converted from numbers
+            if (cell_type == basestring and isinstance(top_cell, basestring) and
+                    re.search(allregex.year_regex, top_cell)):
+                return None
+        for row_index in xrange(old_num_rows, len(ptable)):
+            row = ptable[row_index]
+            if [get_cell_type(row[column_index]) for column_index in columns] != last_types:
+                return None
+            if (isinstance(row[start_column], basestring) and
+                    re.search(allregex.year_regex, row[start_column])):
+                return None
+
+        block.extend_rows(len(ptable), LazySparseTable(len(ptable), len(last_row)),
+                          self.max_title_rows)
+        # A search of the extended block would walk down to the new end and validate all of it
+        block.search.searched[2] = len(ptable)
+        block.search.peeked.append([block.start[0] - 1, block.start[1] - 1, block.end[0] - 1,
+                                    block.end[1] - 1])
+        self._commit_deferred(worksheet, (old_num_rows, start_column), block.end,
+                              self.flags_by_table[worksheet], self.units_by_table[worksheet])
+        return block
+
+    def _worksheet_searches(self, worksheet):
+        '''
+        Lists the BlockSearch of every block and rejected search of a worksheet.
+        '''
+        return ([block.search for block in self.processed_blocks
+                 if isinstance(block, TableBlock) and block.worksheet == worksheet] +
+                self._rejected_by_table[worksheet])
+
+    def _has_table_blocks(self, worksheet):
+        '''
+        Checks if any TableBlocks were generated for a worksheet.
+        '''
+        return any(isinstance(block, TableBlock) and block.worksheet == worksheet
+                   for block in self.processed_blocks)
+
+    def _reanalyze_areas(self, worksheet, areas):
+        '''
+        Converts the cells of a worksheet inside the inclusive [min_row, min_column, max_row,
+        max_column] areas again and searches for blocks only inside them, as described in
+        update_cells. The whole worksheet is searched again when its block mode was chosen with
+        assume_complete_blocks='auto' and the converted cells change the choice. Areas must cover
+        every changed cell.
+
+        The areas are grown until searching them finds what a search of the whole worksheet would.
+        Any search of the worksheet which read or peeked at a cell of the areas (see
+        _find_valid_block) could now find something else, so it is dropped and the cells its walks
+        read are added to the areas. A search inside the areas which read a cell past them was cut
+        short by their edge, so they are grown blank_repeat_threshold + 1 cells past it. Peeked at
+        cells are read without being searched, so they must hold what a serial search would have
+        left in them by then. A kept block which a search inside the areas peeked at is searched
+        again when a serial search finds it later, and areas peeked at from another area are joined
+        with it.
+
+        Returns:
+            The list of newly found blocks.
+        '''
+        worksheet_blocks = [block for block in self.processed_blocks
+                            if isinstance(block, TableBlock) and block.worksheet == worksheet]
+        rejected = self._rejected_by_table[worksheet]
+        ptable = self.processed_tables[worksheet]
+        num_rows = len(ptable)
+        num_columns = ptable.num_columns
+        margin = self.blank_repeat_threshold + 1
+        # Areas never reach past the worksheet's region
+        start_pos, end_pos = self._worksheet_region(worksheet) or ((0, 0), (num_rows, num_columns))
+        areas = merge_overlapping_bounds([clip_bounds(area, start_pos, end_pos) for area in areas])
+        summary = self.summaries_by_table[worksheet]
+        invalid_blocks = set()
+        # The indexes of the invalidated searches in rejected
+        invalid_rejected = set()
+        while True:
+            while True:
+                touching_blocks = [block for block in worksheet_blocks
+                                   if block not in invalid_blocks and
+                                   self._search_reads(block.search, areas)]
+                touching_rejected = [index for index, search in enumerate(rejected)
+                                     if index not in invalid_rejected and
+                                     self._search_reads(search, areas)]
+                if not touching_blocks and not touching_rejected:
+                    break
+                invalid_blocks.update(touching_blocks)
+                invalid_rejected.update(touching_rejected)
+                touching = ([block.search for block in touching_blocks] +
+                            [rejected[index] for index in touching_rejected])
+                areas = merge_overlapping_bounds(areas + [clip_bounds(search.searched, start_pos,
+                                                                      end_pos)
+                                                          for search in touching])
+
+            # Flags and units of each attempt are collected apart from the worksheet's so the old
+            # ones only need to be swept out once the areas are settled
+            area_flags = {}
+            area_units = {}
+            for area in areas:
+                self._reconvert_area(worksheet, area, area_flags, area_units)
+            if self._block_mode_changed(worksheet):
+                # The whole worksheet is converted again before its block mode is chosen, so
+                # cells repaired by the old blocks can't sway the choice
+                areas = [[start_pos[0], start_pos[1], end_pos[0] - 1, end_pos[1] - 1]]
+                invalid_blocks.update(worksheet_blocks)
+                invalid_rejected.update(xrange(len(rejected)))
+                area_flags = {}
+                area_units = {}
+                self._reconvert_area(worksheet, areas[0], area_flags, area_units)
+                self.block_modes_by_table[worksheet] = self._choose_block_mode(ptable, summary,
+                        self._worksheet_region(worksheet))
+
+            _track_assume_blocks = self.assume_complete_blocks
+            _track_rejected_searches = self._rejected_searches
+            try:
+                self.assume_complete_blocks = self.block_modes_by_table[worksheet][
+                    'assume_complete_blocks']
+                self._rejected_searches = new_rejected = []
+                used_cells = LazySparseTable(num_rows, num_columns)
+                new_blocks = []
+                for area in areas:
+                    new_blocks.extend(self._find_blocks(ptable, worksheet, area_flags, area_units,
+                            { 'worksheet': worksheet }, (area[0], area[1]),
+                            (area[2] + 1, area[3] + 1), summary, used_cells))
+            finally:
+                self.assume_complete_blocks = _track_assume_blocks
+                self._rejected_searches = _track_rejected_searches
+
+            kept_blocks = [block for block in worksheet_blocks if block not in invalid_blocks]
+            grown_areas = [list(area) for area in areas]
+            for search, order in ([(block.search, self._search_order(block))
+                                   for block in new_blocks] +
+                                  [(search, tuple(search.found_at) + (True,))
+                                   for search in new_rejected]):
+                area = [area for area in areas if bounds_overlap(area, search.found_at * 2)][0]
+                searched = clip_bounds(search.searched, start_pos, end_pos)
+                if searched != clip_bounds(searched, area[:2], (area[2] + 1, area[3] + 1)):
+                    grown_areas.append(clip_bounds([area[0],
+                            area[1] - margin if searched[1] < area[1] else area[1],
+                            area[2] + margin if searched[2] > area[2] else area[2],
+                            area[3] + margin if searched[3] > area[3] else area[3]],
+                            start_pos, end_pos))
+                for other in areas:
+                    if other is not area and self._search_reads(search, [other]):
+                        grown_areas.append([min(area[0], other[0]), min(area[1], other[1]),
+                                            max(area[2], other[2]), max(area[3], other[3])])
+                for block in kept_blocks:
+                    if (self._search_order(block) > order and
+                            any(bounds_overlap(peek, block.start + [block.end[0] - 1,
+                                                                    block.end[1] - 1])
+                                for peek in search.peeked)):
+                        grown_areas.append(clip_bounds(block.search.searched, start_pos, end_pos))
+            grown_areas = merge_overlapping_bounds(grown_areas)
+            if grown_areas == areas:
+                break
+            areas = grown_areas
+
+        self._replace_area_flags(worksheet, areas, area_flags, area_units)
+        for block in new_blocks:
+            block.flags = self.flags_by_table[worksheet]
+            block.units = self.units_by_table[worksheet]
+            self._share_flag_index(block)
+
+        kept_blocks = [block for block in worksheet_blocks if block not in invalid_blocks]
+        first_index = self.processed_blocks.index(worksheet_blocks[0])
+        other_blocks = [block for block in self.processed_blocks
+                        if getattr(block, 'worksheet', None) != worksheet]
+        other_blocks[first_index:first_index] = sorted(kept_blocks + new_blocks,
+                                                       key=self._search_order)
+        self.processed_blocks = other_blocks
+        rejected[:] = [search for index, search in enumerate(rejected)
+                       if index not in invalid_rejected] + new_rejected
+        return new_blocks
+
+    def _block_mode_changed(self, worksheet):
+        '''
+        Checks if the block mode of a worksheet was chosen with assume_complete_blocks='auto' and
+        _choose_block_mode now picks the other search for its edited cells.
+        '''
+        block_mode = self.block_modes_by_table[worksheet]
+        if block_mode['reason'] == 'requested':
+            return False
+        block_mode_now = self._choose_block_mode(self.processed_tables[worksheet],
+                self.summaries_by_table[worksheet], self._worksheet_region(worksheet))
+        return block_mode_now['assume_complete_blocks'] != block_mode['assume_complete_blocks']
+
+    def _search_reads(self, search, areas):
+        '''
+        Checks if a BlockSearch read or peeked at any cell of the inclusive [min_row, min_column,
+        max_row, max_column] areas.
+        '''
+        return any(bounds_overlap(search.searched, area) or
+                   any(bounds_overlap(peek, area) for peek in search.peeked) for area in areas)
+
+    def _replace_area_flags(self, worksheet, areas, area_flags, area_units):
+        '''
+        Replaces the flags and units of a worksheet located at cells inside the inclusive
+        [min_row, min_column, max_row, max_column] areas with area_flags and area_units. Flags
+        without a cell location are kept.
+        '''
+        flags = self.flags_by_table[worksheet]
+        units = self.units_by_table[worksheet]
+        min_row = min(area[0] for area in areas)
+        max_row = max(area[2] for area in areas)
+        def outside(location):
+            if not isinstance(location, (tuple, list)) or None in location:
+                return True
+            if location[0] < min_row or location[0] > max_row:
+                return True
+            return not any(area[0] <= location[0] <= area[2] and area[1] <= location[1] <= area[3]
+                           for area in areas)
+        for level in flags.keys():
+            flags[level] = [flag for flag in flags[level] if outside(flag.location)]
+            if not flags[level]:
+                del flags[level]
+        for level, level_flags in area_flags.iteritems():
+            flags.setdefault(level, []).extend(level_flags)
+        for area in areas:
+            for row_index in xrange(area[0], area[2] + 1):
+                for column_index in xrange(area[1], area[3] + 1):
+                    units.pop((row_index, column_index), None)
+        units.update(area_units)
+
+    def _reconvert_area(self, worksheet, area, flags, units):
+        '''
+        Converts the cells of an inclusive [min_row, min_column, max_row, max_column] area again
+        from their input values, adding their flags and units to flags and units. Deferred flags of
+        the area are replaced.
+        '''
+        ptable = self.processed_tables[worksheet]
+        summary = self.summaries_by_table[worksheet]
+        deferred = self.deferred_by_table[worksheet] if self.deferred_by_table else {}
+        skipped_rows = (self.skippable_rows or {}).get(worksheet, ())
+        skipped_columns = (self.skippable_columns or {}).get(worksheet, ())
+        columns = xrange(area[1], area[3] + 1)
+        for row_index in xrange(area[0], area[2] + 1):
+            deferred_row = deferred.get(row_index)
+            if deferred_row:
+                for column_index in columns:
+                    deferred_row.pop(column_index, None)
+                if not deferred_row:
+                    del deferred[row_index]
+            ptable_row = ptable[row_index]
+            for column_index in columns:
+                position = (row_index, column_index)
+                if row_index in skipped_rows:
+                    conversion = None
+                elif column_index in skipped_columns:
+                    conversion = None
+                    self.flag_change(flags, 'interpreted', position, worksheet,
+                                     self.FLAGS['skipped-column'])
+                else:
+                    conversion = self._convert_cell(
+                        self.original_cell(worksheet, row_index, column_index), position,
+                        worksheet, flags, units)
+                cell = ptable_row[column_index]
+                if cell is not conversion:
+                    summary.update_cell(row_index, column_index, cell, conversion)
+                    ptable_row[column_index] = conversion
+
+    def _choose_block_mode(self, table, summary, region=None):
+        '''
+        Performs a cheap pre-pass over the row summaries of a worksheet to decide whether its layout
+        suits the complete block search. This is only the case when every run of non-empty rows
+        forms a dense rectangle: no row has blanks between its first and last values, every row
+        spans all columns of the worksheet, runs are separated by more blank rows than
+        blank_repeat_threshold, no run is a single cell and no blank rows follow the last run.
+        Anything else (sparse data, offset or partial titles, side by side blocks, blank edges
+        which the full search stretches blocks over) needs the full search.
+
+        Only the layout is checked, not the cells. The complete block search doesn't split a
+        rectangle at rows of titles below its data or reject one without titles, so blocks can
+        still differ from the full search's when the rectangles hold such cells.
+
+        Args:
+            region: Limits the check to the rows of a (start_pos, end_pos) rectangle.
+
+        Returns:
+            A dictionary holding the chosen 'assume_complete_blocks' value, the 'reason' for it
+            and the 'fill_density' of the worksheet's content rows.
+        '''
+        filled = 0
+        span_area = 0
+        reason = None
+        prior_span = None
+        prior_content_row = None
+        rows = xrange(region[0][0], region[1][0]) if region != None else xrange(len(table))
+        if region != None:
+            start_column, end_column = region[0][1], region[1][1]
+        else:
+            start_column, end_column = 0, table.num_columns
+        for row_index in rows:
+            row_summary = summary.row(row_index)
+            if row_summary.last == None:
+                prior_span = None
+                continue
+            blank_gap = row_index - prior_content_row - 1 if prior_content_row != None else 0
+            prior_content_row = row_index
+            span = (row_summary.first, row_summary.last)
+            row_filled = row_summary.text_count + row_summary.num_count
+            filled += row_filled
+            span_area += span[1] - span[0] + 1
+            if reason != None:
+                continue
+            if row_filled < span[1] - span[0] + 1:
+                reason = 'row %d has blank cells between its first and last values' % row_index
+            elif 0 < blank_gap <= self.blank_repeat_threshold:
+                reason = 'row %d follows a blank gap the full search could bridge' % row_index
+            elif prior_span != None and span != prior_span:
+                reason = 'row %d spans different columns than the row above it' % row_index
+            elif span[0] > start_column:
+                reason = 'row %d has blank columns before it' % row_index
+            elif span[1] < end_column - 1:
+                reason = 'row %d has blank columns after it' % row_index
+            elif prior_span == None and span[0] == span[1] and (row_index == rows[-1] or
+                    summary.row(row_index + 1).last == None):
+                reason = 'row %d holds a single cell' % row_index
+            prior_span = span
+
+        if not span_area:
+            reason = 'worksheet is empty'
+        elif reason == None and prior_content_row < rows[-1]:
+            reason = 'row %d has blank rows after it' % prior_content_row
+        fill_density = float(filled) / span_area if span_area else 0.0
+        return { 'assume_complete_blocks': reason == None,
+                 'reason': reason or 'every run of non-empty rows is a dense rectangle',
+                 'fill_density': fill_density }
+
+    def original_cell(self, worksheet, row_index, column_index):
+        '''
+        Gets the value a cell held in the input tables before any conversion or repair.
+        '''
+        table = self.raw_tables[worksheet]
+        cell = table[row_index][column_index]
+        if self.originals_by_table and self.originals_by_table[worksheet] != None:
+            return self.originals_by_table[worksheet].original(row_index, column_index, cell)
+        return cell
+
+    def trim_worksheet(self, table):
+        '''
+        Finds the trailing rows and columns of a worksheet which hold only None or whitespace cells
+        and leaves them out of a view of the worksheet. Rows are scanned back from their end, so
+        the content of the worksheet is only visited up to its last non-blank cell per row. Dense
+        worksheets are wrapped in a PaddedTable, while SparseTables have their in bounds cells
+        copied into a smaller SparseTable when anything is trimmed.
+
+        Returns:
+            The trimmed worksheet and a (rows_trimmed, columns_trimmed) tuple.
+        '''
+        num_rows = len(table)
+        while num_rows > 0 and self._content_length(table[num_rows - 1]) == 0:
+            num_rows -= 1
+        num_columns = 0
+        original_columns = 0
+        for row_index in xrange(num_rows):
+            row = table[row_index]
+            original_columns = max(original_columns, len(row))
+            num_columns = self._content_length(row, num_columns)
+        for row_index in xrange(num_rows, len(table)):
+            original_columns = max(original_columns, len(table[row_index]))
+        trimmed = (len(table) - num_rows, original_columns - num_columns)
+
+        if not isinstance(table, SparseTable):
+            return PaddedTable(table, num_rows, num_columns), trimmed
+        if trimmed != (0, 0):
+            table = SparseTable(num_rows, num_columns, dict(
+                (position, cell) for position, cell in table.iter_cells()
+                if position[0] < num_rows and position[1] < num_columns))
+        return table, trimmed
+
+    def _content_length(self, row, lower=0):
+        '''
+        Finds the length of a row up to its last non-blank cell, scanning back from the end of the
+        row. Cells before lower are not checked and lower is returned if no later cell has content.
+        '''
+        if isinstance(row, SparseRow):
+            columns = reversed(row.stored_columns(lower))
+        else:
+            columns = reversed(xrange(lower, len(row)))
+        for column_index in columns:
+            if not is_blank_cell(row[column_index]):
+                return column_index + 1
+        return lower
+
+    def _flag_trimmed_edges(self, flags, worksheet):
+        '''
+        Reports the rows and columns removed by trim_worksheet. Locations point at the first
+        trimmed row or column.
+        '''
+        rows_trimmed, columns_trimmed = self.trimmed_by_table[worksheet]
+        table = self.raw_tables[worksheet]
+        if rows_trimmed:
+            self.flag_change(flags, 'minor', (len(table), None), worksheet,
+                             self.FLAGS['trimmed-rows'] % rows_trimmed)
+        if columns_trimmed:
+            self.flag_change(flags, 'minor', (None, table.num_columns), worksheet,
+                             self.FLAGS['trimmed-columns'] % columns_trimmed)
+
+    def _worksheet_region(self, worksheet):
+        '''
+        Gets the (start_pos, end_pos) rectangle of a preprocessed worksheet, or None when the whole
+        worksheet was preprocessed or it hasn't been preprocessed yet.
+        '''
+        if self.regions_by_table == None or worksheet >= len(self.regions_by_table):
+            return None
+        return self.regions_by_table[worksheet]
+
+    def _clip_region(self, worksheet):
+        '''
+        Gets the (start_pos, end_pos) rectangle of regions for a worksheet, clipped to the
+        worksheet and trimmed like trim_worksheet when trim_blank_edges is set, or None when there
+        are no regions. Worksheets left out of regions get an empty rectangle.
+        '''
+        if self.regions == None:
+            return None
+        table = self.raw_tables[worksheet]
+        start_pos, end_pos = self.regions.get(worksheet, ((0, 0), (0, 0)))
+        num_rows, num_columns = len(table), table.num_columns
+        start_pos = (min(max(start_pos[0], 0), num_rows), min(max(start_pos[1], 0), num_columns))
+        end_pos = (min(max(end_pos[0], start_pos[0]), num_rows),
+                   min(max(end_pos[1], start_pos[1]), num_columns))
+        if self.trim_blank_edges:
+            content_rows = start_pos[0]
+            content_columns = 0
+            for row_index in xrange(start_pos[0], end_pos[0]):
+                length = self._content_length(table[row_index][start_pos[1]:end_pos[1]])
+                if length:
+                    content_rows = row_index + 1
+                    content_columns = max(content_columns, length)
+            end_pos = (content_rows, start_pos[1] + content_columns)
+        return start_pos, end_pos
+
+    def preprocess_region(self, table, worksheet, start_pos, end_pos):
+        '''
+        Same as preprocess_worksheet but only converts the cells between start_pos and end_pos
+        (exclusive). The converted table keeps the size of the input so that positions, flags and
+        units stay absolute, but it is a LazySparseTable holding just the converted cells, so the
+        work and memory scale with the size of the region rather than the worksheet. Regions are
+        never converted in place.
+        '''
+        table_conversion = LazySparseTable(len(table), table.num_columns)
+        flags = {}
+        units = {}
+        skipped_rows = (self.skippable_rows or {}).get(worksheet, ())
+        skipped_columns = set((self.skippable_columns or {}).get(worksheet, ()))
+        for rind in xrange(start_pos[0], end_pos[0]):
+            row = table[rind]
+            if rind in skipped_rows:
+                self.flag_change(flags, 'interpreted', (rind, None), worksheet,
+                                 self.FLAGS['skipped-row'])
+                continue
+            if isinstance(row, SparseRow):
+                columns = set(row.stored_columns(start_pos[1], end_pos[1]))
+            else:
+                stored_length = row.stored_length() if isinstance(row, PaddedRow) else len(row)
+                columns = set(xrange(start_pos[1], min(end_pos[1], stored_length)))
+            columns.update(cind for cind in skipped_columns if start_pos[1] <= cind < end_pos[1])
+            for cind in sorted(columns):
+                position = (rind, cind)
+                if cind in skipped_columns:
+                    self.flag_change(flags, 'interpreted', position, worksheet,
+                                     self.FLAGS['skipped-column'])
+                    continue
+                conversion = self._convert_cell(row[cind], position, worksheet, flags, units)
+                if conversion is not None:
+                    table_conversion[rind][cind] = conversion
+        return table_conversion, flags, units
 
-    def preprocess_worksheet(self, table, worksheet):
+    def _unflag_trimmed_edges(self, flags, worksheet):
+        '''
+        Removes the flags raised by _flag_trimmed_edges, such as before the worksheet grows.
+        '''
+        scratch_flags = {}
+        self._flag_trimmed_edges(scratch_flags, worksheet)
+        for flag in scratch_flags.get('minor', []):
+            flags['minor'].remove(flag)
+        if 'minor' in flags and not flags['minor']:
+            del flags['minor']
+
+    def preprocess_worksheet(self, table, worksheet, originals=None):
         '''
         Performs a preprocess pass of the table to attempt naive conversions of data and to record
-        the initial types of each cell.
+        the initial types of each cell. Only cells backed by the input rows are converted and the
+        converted table is returned as a PaddedTable of the same size as the input.
+
+        Args:
+            originals: An OriginalValues side table. When given, conversions are written back into
+                the input rows instead of a new table and the values they replace are recorded in
+                originals. Skipped rows and columns are cleared.
         '''
-        table_conversion = []
+        if isinstance(table, SparseTable):
+            return self.preprocess_sparse_worksheet(table, worksheet, originals)
         flags = {}
         units = {}
-        for rind, row in enumerate(table):
+        table_conversion = self._preprocess_rows(table, worksheet, flags, units, originals)
+        num_columns = max(len(row) for row in table) if table else 0
+        # Give back our conversions, type labeling, and conversion flags
+        return PaddedTable(table_conversion, num_columns=num_columns), flags, units
+
+    def _preprocess_rows(self, table, worksheet, flags, units, originals=None, start_row=0,
+                         end_row=None):
+        '''
+        Converts the rows of a dense worksheet from start_row up to end_row (exclusive, defaults to
+        every row) for preprocess_worksheet.
+
+        Returns:
+            The list of converted rows, which are the input rows themselves when originals is given.
+        '''
+        table_conversion = []
+        for rind in xrange(start_row, len(table) if end_row == None else end_row):
+            row = table[rind]
             conversion_row = []
-            table_conversion.append(conversion_row)
+            table_conversion.append(conversion_row if originals == None else row)
             if self.skippable_rows and worksheet in self.skippable_rows and rind in self.skippable_rows[worksheet]:
                 self.flag_change(flags, 'interpreted', (rind, None), worksheet, self.FLAGS['skipped-row'])
+                if originals != None:
+                    for cind, cell in enumerate(unpadded_cells(row)):
+                        if originals.record(rind, cind, cell, None):
+                            row[cind] = None
                 continue
-            for cind, cell in enumerate(row):
+            stored_length = 0
+            for cind, cell in enumerate(unpadded_cells(row)):
                 position = (rind, cind)
                 if self.skippable_columns and worksheet in self.skippable_columns and cind in self.skippable_columns[worksheet]:
                     conversion = None
                     self.flag_change(flags, 'interpreted', position, worksheet, self.FLAGS['skipped-column'])
                 else:
                     # Do the heavy lifting in pre_process_cell
-                    conversion = auto_convert_cell(self, cell, position, worksheet, flags, units,
-                            parens_as_neg=self.parens_as_neg)
-                conversion_row.append(conversion)
-        # Give back our conversions, type labeling, and conversion flags
+                    conversion = self._convert_cell(cell, position, worksheet, flags, units)
+                if originals == None:
+                    conversion_row.append(conversion)
+                elif originals.record(rind, cind, cell, conversion) or conversion is not cell:
+                    row[cind] = conversion
+                stored_length += 1
+            if self.skippable_columns and worksheet in self.skippable_columns:
+                # Padded cells aren't converted but skipped columns are still flagged
+                for cind in sorted(set(self.skippable_columns[worksheet])):
+                    if stored_length <= cind < len(row):
+                        self.flag_change(flags, 'interpreted', (rind, cind), worksheet,
+                                         self.FLAGS['skipped-column'])
+        return table_conversion
+
+    def _convert_cell(self, cell, position, worksheet, flags, units):
+        '''
+        Converts a cell during preprocessing. With lazy_conversion set, cells which convert to
+        themselves (blanks, numbers and plain text) skip the full conversion, while the flags and
+        units of any other cell are held back in deferred_by_table until the cell is found to be in
+        a block or is read through converted_cell. Text conversions are swapped for their string in
+        string_pool, so each distinct text is held once however many cells repeat it.
+        '''
+        if not self.lazy_conversion:
+            conversion = auto_convert_cell(self, cell, position, worksheet, flags, units,
+                                           parens_as_neg=self.parens_as_neg)
+        elif is_plain_cell(cell):
+            if isinstance(cell, basestring):
+                conversion = cell.strip() if cell else None
+            else:
+                conversion = cell
+        else:
+            cell_flags = {}
+            cell_units = {}
+            conversion = auto_convert_cell(self, cell, position, worksheet, cell_flags,
+                                           cell_units, parens_as_neg=self.parens_as_neg)
+            if cell_flags or cell_units:
+                deferred = self.deferred_by_table[worksheet]
+                deferred.setdefault(position[0], {})[position[1]] = (cell_flags, cell_units)
+        if isinstance(conversion, basestring):
+            return self.string_pool.intern(conversion)
+        return conversion
+
+    def _commit_deferred(self, worksheet, start, end, flags, units):
+        '''
+        Moves the deferred flags and units of the cells between start and end (exclusive) into
+        flags and units.
+        '''
+        if not self.deferred_by_table:
+            return
+        deferred = self.deferred_by_table[worksheet]
+        for row_index in xrange(start[0], end[0]):
+            deferred_row = deferred.get(row_index)
+            if not deferred_row:
+                continue
+            for column_index in [column_index for column_index in deferred_row
+                                 if start[1] <= column_index < end[1]]:
+                cell_flags, cell_units = deferred_row.pop(column_index)
+                for level, level_flags in cell_flags.iteritems():
+                    flags.setdefault(level, []).extend(level_flags)
+                units.update(cell_units)
+            if not deferred_row:
+                del deferred[row_index]
+
+    def converted_cell(self, worksheet, row_index, column_index):
+        '''
+        Gets the preprocessed value of a cell, committing its deferred flags and units first when
+        lazy_conversion is set.
+        '''
+        self._commit_deferred(worksheet, (row_index, column_index),
+                              (row_index + 1, column_index + 1),
+                              self.flags_by_table[worksheet], self.units_by_table[worksheet])
+        return self.processed_tables[worksheet][row_index][column_index]
+
+    def preprocess_sparse_worksheet(self, table, worksheet, originals=None):
+        '''
+        Same as preprocess_worksheet but for SparseTables. Only stored cells are converted, so the
+        work scales with the number of non-empty cells rather than the area of the worksheet. Flags
+        are raised in the same order as the dense pass.
+        '''
+        table_conversion = table.empty_copy() if originals == None else table
+        flags = {}
+        units = {}
+        self._preprocess_sparse_rows(table, table_conversion, worksheet, flags, units, originals)
         return table_conversion, flags, units
 
-    def fill_in_table(self, table, worksheet, flags):
+    def _preprocess_sparse_rows(self, table, table_conversion, worksheet, flags, units,
+                                originals=None, start_row=0):
+        '''
+        Converts the rows of a SparseTable from start_row onwards into table_conversion for
+        preprocess_sparse_worksheet.
+        '''
+        skipped_columns = []
+        if self.skippable_columns and worksheet in self.skippable_columns:
+            skipped_columns = sorted(set(self.skippable_columns[worksheet]))
+        for rind in xrange(start_row, len(table)):
+            row = table[rind]
+            if self.skippable_rows and worksheet in self.skippable_rows and rind in self.skippable_rows[worksheet]:
+                self.flag_change(flags, 'interpreted', (rind, None), worksheet, self.FLAGS['skipped-row'])
+                if originals != None:
+                    for cind in row.stored_columns():
+                        originals.record(rind, cind, row[cind], None)
+                        row[cind] = None
+                continue
+            conversion_row = table_conversion[rind]
+            skipped = [cind for cind in skipped_columns if cind < len(row)]
+            for cind in sorted(set(row.stored_columns()).union(skipped)):
+                position = (rind, cind)
+                if skipped and cind in self.skippable_columns[worksheet]:
+                    self.flag_change(flags, 'interpreted', position, worksheet, self.FLAGS['skipped-column'])
+                    conversion = None
+                else:
+                    conversion = self._convert_cell(row[cind], position, worksheet, flags, units)
+                if (originals == None or originals.record(rind, cind, row[cind], conversion) or
+                        conversion is not row[cind]):
+                    conversion_row[cind] = conversion
+
+    def _uses_bands(self, worksheet):
+        '''
+        Checks if a worksheet is large enough, and analyzed in a way which allows it, to be split
+        into bands which are worked on by a pool of worker processes.
+        '''
+        table = self.raw_tables[worksheet]
+        return ((self.processes or 1) > 1 and bands.can_fork() and not self.in_place and
+                not self.lazy_conversion and not isinstance(table, SparseTable) and
+                len(table) * table.num_columns >= self.BAND_MIN_CELLS)
+
+    def _preprocess_bands(self, table, worksheet):
+        '''
+        Same as preprocess_worksheet, but the rows are split into one band per process and each
+        band is converted by a worker process. Cells convert independently of each other and the
+        flags of each band are joined in row order, so the result matches preprocess_worksheet.
+        '''
+        row_edges = [len(table) * band // self.processes for band in xrange(self.processes + 1)]
+        results = bands.map_bands(self, '_preprocess_band', [(worksheet, start_row, end_row)
+                for start_row, end_row in zip(row_edges, row_edges[1:])], self.processes)
+        table_conversion = []
+        flags = {}
+        units = {}
+        for rows, band_flags, band_units in results:
+            # Each worker interned its band into its own copy of the pool
+            self.string_pool.intern_rows(rows)
+            table_conversion.extend(rows)
+            for level, level_flags in band_flags.iteritems():
+                flags.setdefault(level, []).extend(level_flags)
+            units.update(band_units)
+        return PaddedTable(table_conversion, num_columns=table.num_columns), flags, units
+
+    def _preprocess_band(self, worksheet, start_row, end_row):
+        '''
+        Converts the rows of a worksheet between start_row and end_row (exclusive) in a worker
+        process of _preprocess_bands.
+        '''
+        flags = {}
+        units = {}
+        rows = self._preprocess_rows(self.raw_tables[worksheet], worksheet, flags, units,
+                                     start_row=start_row, end_row=end_row)
+        return rows, flags, units
+
+    def _worksheet_originals(self, worksheet):
         '''
-        Fills in any rows with missing right hand side data with empty cells.
+        Gets the OriginalValues of a worksheet, or None if it wasn't preprocessed in place.
         '''
-        max_row = 0
-        min_row = sys.maxint
-        for row in table:
-            if len(row) > max_row:
-                max_row = len(row)
-            if len(row) < min_row:
-                min_row = len(row)
-        if max_row != min_row:
-            for row in table:
-                if len(row) < max_row:
-                    row.extend([None]*(max_row-len(row)))
+        if self.originals_by_table and worksheet < len(self.originals_by_table):
+            return self.originals_by_table[worksheet]
+        return None
 
     def _find_blocks(self, converted_table, worksheet, flags, units,
-                     block_meta=None, start_pos=None, end_pos=None):
+                     block_meta=None, start_pos=None, end_pos=None, summary=None, used_cells=None):
         '''
         A block is considered any region where we have the following structure:
 
@@ -161,68 +1273,350 @@ class TableAnalyzer(Flagable):
 
         With the default cases of all text and all numbers matching to a single block encompassing
         the entire table.
+
+        The summary of the converted table and the used cell tracking are built here when they
+        aren't provided. Blocks are yielded as they are found.
         '''
-        blocks = []
-        used_cells = []
+        # Catch an empty table or blank rows
+        if not converted_table or all(not row for row in converted_table):
+            self.flag_change(flags, 'error', worksheet=worksheet, message="Empty table")
+            yield converted_table
+            return
 
         if start_pos == None:
             start_pos = (0, 0)
         if end_pos == None:
             end_pos = (len(converted_table), max(
                             len(row) for row in converted_table))
+        if summary == None:
+            summary = TableSummary(converted_table)
 
         # Track used cells -- these can be non-rectangular, but must be 2D
-        for row in converted_table:
-            used_cells.append([False]*len(row))
-        # Catch an empty table or blank rows
-        if not converted_table or all(not row for row in converted_table):
-            blocks.append(converted_table)
-            self.flag_change(flags, 'error', worksheet=worksheet, message="Empty table")
-            return blocks
+        if used_cells == None:
+            if isinstance(converted_table, SparseTable):
+                used_cells = converted_table.empty_copy()
+            else:
+                used_cells = [[False]*len(row) for row in converted_table]
+
+        for block in self._find_region_blocks(converted_table, worksheet, flags, units, used_cells,
+                                              start_pos, end_pos, summary):
+            yield block
+
+    def _find_band_blocks(self, worksheet):
+        '''
+        Splits a preprocessed worksheet into one band per process and searches each band for blocks
+        in a worker process. Tall worksheets are split into bands of rows and wide ones into bands
+        of columns, with the cuts placed in runs of blank lines where possible. Cells repaired by
+        the workers, and their flags and units, are copied back into the worksheet.
+
+        A worker's search which read past its band may have been cut short by the edge, and one
+        which peeked at a block of another band found earlier saw its cells before they were
+        repaired, so the cells those searches read are searched again as if they were edited (see
+        update_cells). Blocks therefore match a serial search. The blocks are put in the order a
+        serial search finds them (see _search_order) and the flags each block raised are listed
+        after the flags of preprocessing in the order a serial search raises them.
+
+        Returns:
+            The list of blocks in the worksheet, in the order a serial search finds them.
+        '''
+        ptable = self.processed_tables[worksheet]
+        flags = self.flags_by_table[worksheet]
+        units = self.units_by_table[worksheet]
+        summary = self.summaries_by_table[worksheet]
+        num_rows = len(ptable)
+        num_columns = ptable.num_columns
+        margin = self.blank_repeat_threshold + 1
+        if num_rows >= num_columns:
+            cuts = bands.find_band_cuts(num_rows, lambda row_index:
+                    summary.row(row_index).last == None, self.processes, margin)
+            edges = [0] + cuts + [num_rows]
+            tasks = [(worksheet, (start_row, 0), (end_row, num_columns))
+                     for start_row, end_row in zip(edges, edges[1:])]
+        else:
+            cuts = bands.find_band_cuts(num_columns, lambda column_index:
+                    summary.column(column_index).last == None, self.processes, margin)
+            edges = [0] + cuts + [num_columns]
+            tasks = [(worksheet, (0, start_column), (num_rows, end_column))
+                     for start_column, end_column in zip(edges, edges[1:])]
+
+        results = bands.map_bands(self, '_search_band', tasks, self.processes) if cuts else []
+        if not any(band_blocks for band_blocks, _, _, _, _ in results):
+            # Searches can only be repeated around existing blocks
+            return list(self._find_blocks(ptable, worksheet, flags, units,
+                                          { 'worksheet': worksheet }, summary=summary))
+
+        preprocess_flags = dict((level, list(level_flags)) for level, level_flags
+                                in flags.iteritems())
+        raised_flags = {}
+        used_cells = LazySparseTable(num_rows, num_columns)
+        worksheet_blocks = []
+        band_searches = []
+        for (_, band_start, band_end), (band_blocks, block_flags, band_units, repaired_cells,
+                                        band_rejected) in zip(tasks, results):
+            for (row_index, column_index), cell in repaired_cells.iteritems():
+                if isinstance(cell, basestring):
+                    cell = self.string_pool.intern(cell)
+                row = ptable[row_index]
+                summary.update_cell(row_index, column_index, row[column_index], cell)
+                row[column_index] = cell
+            units.update(band_units)
+            for block, raised in zip(band_blocks, block_flags):
+                for level, level_flags in raised.iteritems():
+                    flags.setdefault(level, []).extend(level_flags)
+                raised_flags[block] = raised
+                block.table = ptable
+                block.used = used_cells
+                block.flags = flags
+                block.units = units
+                self._share_flag_index(block)
+            worksheet_blocks.extend(band_blocks)
+            self._rejected_by_table[worksheet].extend(band_rejected)
+            band_bounds = [band_start[0], band_start[1], band_end[0] - 1, band_end[1] - 1]
+            band_searches.extend((search, order, band_bounds) for search, order in
+                    [(block.search, self._search_order(block)) for block in band_blocks] +
+                    [(search, tuple(search.found_at) + (True,)) for search in band_rejected])
+        worksheet_blocks.sort(key=self._search_order)
+
+        # Blocks are looked up by row for the searches which peeked out of their band
+        blocks_by_row = {}
+        for block in worksheet_blocks:
+            for row_index in xrange(block.start[0], block.end[0]):
+                blocks_by_row.setdefault(row_index, []).append(block)
+        areas = []
+        for search, order, band_bounds in band_searches:
+            band_end = (band_bounds[2] + 1, band_bounds[3] + 1)
+            searched = clip_bounds(search.searched, (0, 0), (num_rows, num_columns))
+            repeat = searched != clip_bounds(searched, band_bounds[:2], band_end)
+            for peek in search.peeked:
+                if repeat:
+                    break
+                peek = clip_bounds(peek, (0, 0), (num_rows, num_columns))
+                if peek == clip_bounds(peek, band_bounds[:2], band_end):
+                    continue
+                repeat = any(self._search_order(block) < order and
+                             not bounds_overlap(block.start * 2, band_bounds) and
+                             bounds_overlap(peek, block.start + [block.end[0] - 1,
+                                                                 block.end[1] - 1])
+                             for row_index in xrange(peek[0], peek[2] + 1)
+                             for block in blocks_by_row.get(row_index, []))
+            if repeat:
+                areas.append(searched)
+
+        # Searches are repeated in place within processed_blocks
+        first_index = len(self.processed_blocks)
+        self.processed_blocks.extend(worksheet_blocks)
+        self._raised_flags = raised_flags
+        try:
+            if areas:
+                self._reanalyze_areas(worksheet, areas)
+        finally:
+            self._raised_flags = None
+        worksheet_blocks = self.processed_blocks[first_index:]
+        del self.processed_blocks[first_index:]
+
+        # The areas converted their cells again, raising the same flags as preprocessing
+        flags.clear()
+        flags.update(preprocess_flags)
+        for block in worksheet_blocks:
+            for level, level_flags in raised_flags[block].iteritems():
+                flags.setdefault(level, []).extend(level_flags)
+        return worksheet_blocks
+
+    def _search_band(self, worksheet, start_pos, end_pos):
+        '''
+        Searches for blocks between start_pos and end_pos in a worker process of _find_band_blocks.
+        Blocks are detached from the worksheet so they can be sent back without it.
+
+        Returns:
+            The blocks found, the {level: [flags]} raised by each of them, their units,
+            {(row#, column#): cell} of the cells repaired while validating them, and the
+            BlockSearch of each rejected search (see _find_valid_block).
+        '''
+        ptable = self.processed_tables[worksheet]
+        flags = {}
+        units = {}
+        repaired = bands.RepairedCells()
+        self.originals_by_table[worksheet] = repaired
+        # Bands cover a large share of the worksheet, so their used cells are tracked densely
+        used_cells = [[False] * ptable.num_columns if start_pos[0] <= row_index < end_pos[0]
+                      else None for row_index in xrange(len(ptable))]
+        self._raised_flags = {}
+        self._rejected_searches = rejected = []
+        band_blocks = list(self._find_blocks(ptable, worksheet, flags, units,
+                { 'worksheet': worksheet }, start_pos, end_pos,
+                self.summaries_by_table[worksheet], used_cells))
+        block_flags = [self._raised_flags[block] for block in band_blocks]
+        self._raised_flags = None
+        self._rejected_searches = None
+        for block in band_blocks:
+            block.table = None
+            block.used = None
+            block.flags = None
+            block.units = None
+            block.flag_index = None
+        return (band_blocks, block_flags, units,
+                dict((position, ptable[position[0]][position[1]])
+                     for position in repaired.positions), rejected)
 
+    def _find_region_blocks(self, table, worksheet, flags, units, used_cells, start_pos, end_pos,
+                            summary=None):
+        '''
+        Repeatedly searches for valid blocks between start_pos and end_pos until none remain,
+        yielding each one as it is found.
+        '''
+        if self.assume_complete_blocks and self.use_numpy and occupancy.numpy != None:
+            for block in self._find_complete_region_blocks(table, worksheet, flags, units,
+                    used_cells, start_pos, end_pos, summary):
+                yield block
+            return
         # Start with a boolean to get the while loop going
         block = True
         block_search_start = start_pos
         while block:
             # Returns None if no more blocks exist
-            block = self._find_valid_block(converted_table, worksheet, flags, units, used_cells,
-                        block_search_start, end_pos)
+            block = self._find_valid_block(table, worksheet, flags, units, used_cells,
+                        block_search_start, end_pos, summary)
             if block:
-                blocks.append(block)
+                yield block
                 # Restart on the row of the last block at the
                 # beginning column
                 block_search_start = (block.start[0], start_pos[1])
 
-        return blocks
+    def _find_complete_region_blocks(self, table, worksheet, flags, units, used_cells, start_pos,
+                                     end_pos, summary=None):
+        '''
+        Same as _find_region_blocks when assume_complete_blocks is active, but candidate blocks are
+        located with array operations over a boolean occupancy array of the region rather than by
+        walking the table one cell at a time. Only the validation of each block runs cell by cell.
+
+        The blocks found match _find_complete_block_bounds exactly: a block's columns run from its
+        first cell to the first empty or used cell of that row, and its rows run until a row has an
+        empty cell within those columns.
+        '''
+        end_pos = (min(end_pos[0], len(table)), end_pos[1])
+        occupied = occupancy.occupancy_array(table, start_pos, end_pos)
+        # Occupied cells which no block has claimed yet
+        free = occupied.copy()
+        search_row = 0
+        while True:
+            possible_block_start = occupancy.first_true_cell(free, search_row)
+            if possible_block_start == None:
+                return
+            row_offset, column_offset = possible_block_start
+            free_run = free[row_offset, column_offset:]
+            end_column = column_offset + (len(free_run) if free_run.all() else
+                                          int(free_run.argmin()))
+            end_row = row_offset + 1 + occupancy.leading_true_rows(
+                occupied[row_offset+1:, column_offset:end_column])
+            block_start = [row_offset + start_pos[0], column_offset + start_pos[1]]
+            block_end = [end_row + start_pos[0], end_column + start_pos[1]]
+            # The walks read up to the first empty row and column, or just past the region
+            search = BlockSearch(tuple(block_start), block_start + block_end, [])
+            block = self._build_block(table, used_cells, block_start, block_end, worksheet,
+                                      flags, units, summary, search)
+            if block == None:
+                # Prevent infinite loops if something goes wrong
+                used_cells[block_start[0]][block_start[1]] = True
+                free[row_offset, column_offset] = False
+                if self._rejected_searches != None:
+                    self._rejected_searches.append(search)
+                continue
+            free[row_offset:end_row, column_offset:end_column] = False
+            yield block
+            search_row = row_offset
+
+    def _build_block(self, table, used_cells, block_start, block_end, worksheet, flags, units,
+                     summary=None, search=None):
+        '''
+        Validates and constructs the block between block_start and block_end, returning None if it
+        isn't a valid block, in which case the table and flags are left as they were. Any deferred
+        conversion flags and units of the block's cells are committed once the block is accepted.
+        The BlockSearch which found the block is kept in the block's search, with the cells
+        validation reads added to its peeked boxes, and the flags it raised are kept in
+        _raised_flags when it's set.
+        '''
+        if self._raised_flags != None:
+            flag_counts = dict((level, len(level_flags))
+                               for level, level_flags in flags.iteritems())
+        if search != None:
+            # Validation also reads the row above and the column left of the block
+            search.peeked.append([block_start[0] - 1, block_start[1] - 1, block_end[0] - 1,
+                                  block_end[1] - 1])
+        block = TableBlock.create(table, used_cells, block_start, block_end, worksheet, flags,
+                                  units, self.assume_complete_blocks, self.max_title_rows,
+                                  summary=summary, originals=self._worksheet_originals(worksheet),
+                                  string_pool=self.string_pool)
+        if block == None:
+            return None
+        block.search = search
+        self._commit_deferred(worksheet, block.start, block.end, flags, units)
+        self._share_flag_index(block)
+        if self._raised_flags != None:
+            self._raised_flags[block] = dict((level, level_flags[flag_counts.get(level, 0):])
+                    for level, level_flags in flags.iteritems()
+                    if len(level_flags) > flag_counts.get(level, 0))
+        return block
 
-    def _find_valid_block(self, table, worksheet, flags, units, used_cells, start_pos, end_pos):
+    def _search_order(self, block):
+        '''
+        Sort key for blocks of a worksheet which gives the order a serial search finds them in.
+        The search moves forward through the cells of the worksheet, so blocks are found in the
+        order of the cells they were found from. Of the blocks found from the same cell, those not
+        covering it come first, as a covered cell can't be searched from again.
+        '''
+        found_at = block.search.found_at
+        covered = (block.start[0] <= found_at[0] < block.end[0] and
+                   block.start[1] <= found_at[1] < block.end[1])
+        return (found_at[0], found_at[1], covered)
+
+    def _share_flag_index(self, block):
+        '''
+        Gives a block the FlagIndex shared by every block holding the flags of its worksheet, so
+        the worksheet's flags are only indexed once for all of their flag queries.
+        '''
+        flags = self.flags_by_table[block.worksheet]
+        if block.flags is not flags:
+            return
+        flag_index = self._flag_indexes.get(block.worksheet)
+        if flag_index == None or flag_index.flags is not flags:
+            flag_index = self._flag_indexes[block.worksheet] = FlagIndex(flags)
+        block.flag_index = flag_index
+
+    def _find_valid_block(self, table, worksheet, flags, units, used_cells, start_pos, end_pos,
+                          summary=None):
         '''
         Searches for the next location where a valid block could reside and constructs the block
         object representing that location.
+
+        Each search from a cell is recorded in a BlockSearch with the cells it read, so that
+        update_cells can tell which searches an edit could change. Cells just past start_pos or
+        end_pos are counted as read wherever they stopped a walk, as the walk would have gone on
+        without them. Searches which find no block are kept in _rejected_searches when it's set.
         '''
-        for row_index in range(len(table)):
-            if row_index < start_pos[0] or row_index > end_pos[0]:
-                continue
+        for row_index in xrange(start_pos[0], min(end_pos[0], len(table))):
             convRow = table[row_index]
             used_row = used_cells[row_index]
-            for column_index, conv in enumerate(convRow):
-                if (column_index < start_pos[1] or column_index > end_pos[1] or used_row[column_index]):
+            # Only non empty cells can start a block
+            for column_index in nonempty_columns(convRow, start_pos[1], end_pos[1]):
+                if used_row[column_index]:
                     continue
-                # Is non empty cell?
-                if not is_empty_cell(conv):
-                    block_start, block_end = self._find_block_bounds(table, used_cells,
-                            (row_index, column_index), start_pos, end_pos)
-                    if (block_end[0] > block_start[0] and
-                        block_end[1] > block_start[1]):
-                        try:
-                            return TableBlock(table, used_cells, block_start, block_end, worksheet,
-                                flags, units, self.assume_complete_blocks, self.max_title_rows)
-                        except InvalidBlockError:
-                            pass
-                        # Prevent infinite loops if something goes wrong
-                        used_cells[row_index][column_index] = True
-
-    def _find_block_bounds(self, table, used_cells, possible_block_start, start_pos, end_pos):
+                search = BlockSearch((row_index, column_index),
+                                     [row_index, column_index, row_index, column_index], [])
+                block_start, block_end = self._find_block_bounds(table, used_cells,
+                        (row_index, column_index), start_pos, end_pos, summary, search)
+                if (block_end[0] > block_start[0] and
+                    block_end[1] > block_start[1]):
+                    block = self._build_block(table, used_cells, block_start, block_end,
+                                              worksheet, flags, units, summary, search)
+                    if block != None:
+                        return block
+                    # Prevent infinite loops if something goes wrong
+                    used_cells[row_index][column_index] = True
+                if self._rejected_searches != None:
+                    self._rejected_searches.append(search)
+
+    def _find_block_bounds(self, table, used_cells, possible_block_start, start_pos, end_pos,
+                           summary=None, search=None):
         '''
         First walk the rows, checking for the farthest left column belonging to the block and the
         bottom most row belonging to the block. If a blank cell is hit and the column started with a
@@ -232,6 +1626,8 @@ class TableAnalyzer(Flagable):
 
         Then walk the columns until a column is reached which has blank cells down to the row which
         marked the as the row end from prior iteration.
+
+        The cells read by the walks are added to search when it's given (see _find_valid_block).
         '''
         # If we're only looking for complete blocks, then just walk
         # until we hit a blank cell
@@ -239,16 +1635,19 @@ class TableAnalyzer(Flagable):
             block_start, block_end = self._find_complete_block_bounds(
                                         table, used_cells, possible_block_start,
                                         start_pos, end_pos)
+            # The walks stop on the first empty row and column, or just past end_pos
+            if search != None:
+                widen_bounds(search.searched, block_start + block_end)
         # Otherwise do a smart, multi-pass approach to finding blocks
         # with potential missing fields
         else:
             block_start, block_end = self._find_block_start(
                                         table, used_cells, possible_block_start,
-                                        start_pos, end_pos)
+                                        start_pos, end_pos, summary, search)
 
             block_start, block_end = self._find_block_end(
                                         table, used_cells, block_start, block_end,
-                                        start_pos, end_pos)
+                                        start_pos, end_pos, summary, search)
         return block_start, block_end
 
     def _find_complete_block_bounds(self, table, used_cells, possible_block_start,
@@ -265,8 +1664,8 @@ class TableAnalyzer(Flagable):
             # Ensure we catch the edge case of the data reaching the edge of
             # the table -- block_end should then equal end_pos
             block_end[1] = max(block_end[1], column_index)
-            if (column_index == end_pos[1] or used_row[column_index] or
-                    is_empty_cell(table_row[column_index])):
+            if (column_index == end_pos[1] or column_index >= len(table_row) or
+                    used_row[column_index] or is_empty_cell(table_row[column_index])):
                 break
         for row_index in range(block_start[0]+1, end_pos[0]+1):
             block_end[0] = row_index
@@ -276,24 +1675,28 @@ class TableAnalyzer(Flagable):
             table_row = table[row_index]
             blank = False
             for column_index in range(block_start[1], block_end[1]):
-                if (column_index == block_end[1] or used_row[column_index] or
-                        is_empty_cell(table_row[column_index])):
+                if (column_index == block_end[1] or column_index >= len(table_row) or
+                        used_row[column_index] or is_empty_cell(table_row[column_index])):
                     blank = True
                     break
             if blank:
                 break
         return block_start, block_end
 
-    def _single_length_title(self, table, row_index, current_col):
+    def _single_length_title(self, table, row_index, current_col, summary=None):
         '''
         Returns true if the row is a single length title element with no other row titles. Useful
         for tracking pre-data titles that belong in their own block.
         '''
-        if len(table[row_index]) - current_col <= 0:
+        table_row = table[row_index]
+        if len(table_row) - current_col <= 0:
             return False
-        return (is_text_cell(table[row_index][current_col]) and
-                all(not is_text_cell(table[row_index][next_column])
-                    for next_column in xrange(current_col + 1, len(table[row_index]))))
+        if summary != None:
+            # The row's last text cell must be the current cell
+            return summary.row(row_index).last_text == current_col
+        return (is_text_cell(table_row[current_col]) and
+                all(not is_text_cell(table_row[next_column])
+                    for next_column in nonempty_columns(table_row, current_col + 1)))
 
     def _below_blank_repeat_threshold(self, start_row, current_row):
         '''
@@ -307,19 +1710,24 @@ class TableAnalyzer(Flagable):
         '''
         return self.blank_repeat_threshold < 1 + current_row - start_row
 
-    def _find_block_start(self, table, used_cells, possible_block_start, start_pos, end_pos):
+    def _find_block_start(self, table, used_cells, possible_block_start, start_pos, end_pos,
+                          summary=None, search=None):
         '''
         Finds the start of a block from a suggested start location. This location can be at a lower
         column but not a lower row. The function traverses columns until it finds a stopping
         condition or a repeat condition that restarts on the next column.
 
-        Note this also finds the lowest row of block_end.
+        Note this also finds the lowest row of block_end. The cells read are added to search when
+        it's given, where the rows checked for single length titles are peeked at up to their end.
         '''
         current_col = possible_block_start[1]
         block_start = list(possible_block_start)
         block_end = list(possible_block_start)
         repeat = True
         checked_all = False
+        # The furthest cells read, which can lie past the block's bounds
+        last_row = title_row = possible_block_start[0]
+        first_column = last_column = current_col
 
         # Repeat until we've met satisfactory conditions for catching all edge cases or we've
         # checked all valid block locations
@@ -327,8 +1735,8 @@ class TableAnalyzer(Flagable):
             block_end[0] = max(block_end[0], possible_block_start[0])
             block_end[1] = max(block_end[1], current_col)
             single_titled_block = True
-            table_column = TableTranspose(table)[current_col]
-            used_column = TableTranspose(used_cells)[current_col]
+            table_column = TableTranspose(table, verify=False)[current_col]
+            used_column = TableTranspose(used_cells, verify=False)[current_col]
             # We need to find a non empty cell before we can stop
             blank_start = is_empty_cell(table_column[possible_block_start[0]])
             blank_exited = not blank_start
@@ -352,16 +1760,21 @@ class TableAnalyzer(Flagable):
                     break
                 if not blank_exited:
                     blank_exited = not is_empty_cell(table_column[row_index])
-                if single_titled_block and not self._single_length_title(table, row_index, current_col):
+                if single_titled_block and not self._single_length_title(table, row_index,
+                                                                         current_col, summary):
                     single_titled_block = False
+                    title_row = max(title_row, row_index)
                     # If we saw single length titles for several more than threshold rows, then we
                     # have a unique block before an actual content block
                     if self._above_blank_repeat_threshold(possible_block_start[0], row_index):
                         repeat = False
                         break
-                if is_empty_cell(table_column[row_index]) and len(table[row_index]) > current_col + 1:
-                    current_col += 1
-                    break
+                if is_empty_cell(table_column[row_index]):
+                    # Whether the walk moves right depends on the next column too
+                    last_column = max(last_column, current_col + 1)
+                    if min(len(table[row_index]), end_pos[1]) > current_col + 1:
+                        current_col += 1
+                        break
 
                 # Go find the left most column that's still valid
                 table_row = table[row_index]
@@ -371,18 +1784,32 @@ class TableAnalyzer(Flagable):
                         break
                     else:
                         block_start[1] = min(block_start[1], column_index)
+                else:
+                    # The walk was stopped by start_pos rather than a cell
+                    column_index = start_pos[1] - 1
+                first_column = min(first_column, column_index)
                 # Check if we've seen few enough cells to guess that we have a repeating title
                 repeat = blank_start or self._below_blank_repeat_threshold(possible_block_start[0], row_index)
+            last_row = max(last_row, row_index)
+            if single_titled_block:
+                title_row = max(title_row, row_index)
 
+        if search != None:
+            widen_bounds(search.searched, [possible_block_start[0], first_column, last_row,
+                                           max(last_column, block_end[1])])
+            search.peeked.append([possible_block_start[0], possible_block_start[1], title_row,
+                                  sys.maxint])
         return block_start, block_end
 
-    def _find_block_end(self, table, used_cells, block_start, block_end, start_pos, end_pos):
+    def _find_block_end(self, table, used_cells, block_start, block_end, start_pos, end_pos,
+                        summary=None, search=None):
         '''
-        Finds the end of a block from a start location and a suggested end location.
+        Finds the end of a block from a start location and a suggested end location. The cells read
+        are added to search when it's given.
         '''
         table_row = table[block_start[0]]
         used_row = used_cells[block_start[0]]
-        table_transpose = TableTranspose(table)
+        table_transpose = TableTranspose(table, verify=False)
 
         # Find which column the titles end on
         for column_index in range(block_start[1], end_pos[1] + 1):
@@ -394,13 +1821,22 @@ class TableAnalyzer(Flagable):
             if used_row[column_index]:
                 break
             elif is_empty_cell(table_row[column_index]):
-                table_column = table_transpose[column_index]
-                found_cell = False
-                for row_index in range(block_start[0], block_end[0]):
-                    if not is_empty_cell(table_column[row_index]):
-                        found_cell = True
-                        break
+                found_cell = None
+                if summary != None:
+                    found_cell = summary.column(column_index).has_content_between(
+                                    block_start[0], block_end[0])
+                if found_cell == None:
+                    table_column = table_transpose[column_index]
+                    found_cell = False
+                    for row_index in range(block_start[0], block_end[0]):
+                        if not is_empty_cell(table_column[row_index]):
+                            found_cell = True
+                            break
                 # If we have a column of blanks, stop
                 if not found_cell:
                     break
+        if search != None:
+            # The first row is read up to the column the walk stopped on
+            widen_bounds(search.searched, [block_start[0], block_start[1],
+                                           max(block_end[0] - 1, block_start[0]), column_index])
         return block_start, block_end
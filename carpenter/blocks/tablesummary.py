@@ -0,0 +1,184 @@
+from cellanalyzer import is_empty_cell, is_text_cell, is_num_cell
+from sparsetable import nonempty_columns
+
+class LineSummary(object):
+    '''
+    Summarizes the contents of a single row or column of a table. Positions are indices along the
+    line and are None when the line holds no matching cell.
+    '''
+    def __init__(self):
+        self.first = None
+        self.last = None
+        self.text_count = 0
+        self.num_count = 0
+        self.last_text = None
+        self.first_num = None
+        self.last_num = None
+
+    def add(self, position, cell):
+        '''
+        Records a cell being placed at position. Positions must not already hold a cell.
+        '''
+        if is_empty_cell(cell):
+            return
+        self.first = position if self.first == None else min(self.first, position)
+        self.last = position if self.last == None else max(self.last, position)
+        if is_text_cell(cell):
+            self.text_count += 1
+            self.last_text = position if self.last_text == None else max(self.last_text, position)
+        elif is_num_cell(cell):
+            self.num_count += 1
+            self.first_num = position if self.first_num == None else min(self.first_num, position)
+            self.last_num = position if self.last_num == None else max(self.last_num, position)
+
+    def remove(self, position, cell):
+        '''
+        Records a cell being removed from position.
+
+        Returns:
+            False if the removal touched one of the tracked positions, in which case the summary
+            must be rebuilt from the line.
+        '''
+        if is_empty_cell(cell):
+            return True
+        if position in (self.first, self.last, self.last_text, self.first_num, self.last_num):
+            return False
+        if is_text_cell(cell):
+            self.text_count -= 1
+        elif is_num_cell(cell):
+            self.num_count -= 1
+        return True
+
+    def content_length(self):
+        '''
+        Returns the length of the line up to and including its last non-empty cell.
+        '''
+        return 0 if self.last == None else self.last + 1
+
+    def has_content_between(self, start, end):
+        '''
+        Checks if any non-empty cell lies in [start, end).
+
+        Returns:
+            True or False when the summary can answer directly, None when the line must be scanned.
+        '''
+        if self.last == None or self.last < start or self.first >= end:
+            return False
+        if start <= self.first or self.last < end:
+            return True
+        return None
+
+    def has_num_between(self, start, end):
+        '''
+        Same as has_content_between but for numeric cells.
+        '''
+        if self.last_num == None or self.last_num < start or self.first_num >= end:
+            return False
+        if start <= self.first_num or self.last_num < end:
+            return True
+        return None
+
+class TableSummary(object):
+    '''
+    Holds a LineSummary for every row and column of a table so that row and column level questions
+    can be answered without rescanning the table. The summary is built with a single pass over the
+    non-empty cells and must be told about later cell changes through update_cell. Lines whose
+    tracked positions are disturbed by an update are rebuilt lazily the next time they are read.
+
+    As every change to the table passes through update_cell, the summary also keeps journals of the
+    changed cells. Each journal is a dict which is given {(row#, column#): cell} of the value each
+    cell held before its first change since the journal was added.
+
+    Args:
+        table: The 2D table to summarize.
+        start_row: The first row which may hold cells. Rows outside of [start_row, end_row) must
+            stay empty, are only summarized when read and are skipped when rebuilding columns.
+        end_row: The end (exclusive) of the rows which may hold cells. Defaults to every row.
+    '''
+    def __init__(self, table, start_row=0, end_row=None):
+        self.table = table
+        if end_row == None:
+            end_row = len(table)
+        self._row_range = (start_row, end_row)
+        num_columns = getattr(table, 'num_columns', None)
+        if num_columns == None:
+            num_columns = max(len(row) for row in table) if table else 0
+        self._rows = [None] * len(table)
+        self._columns = [LineSummary() for _ in xrange(num_columns)]
+        self.journals = []
+        for row_index in xrange(start_row, end_row):
+            row = table[row_index]
+            row_summary = self._rows[row_index] = LineSummary()
+            for column_index in nonempty_columns(row):
+                cell = row[column_index]
+                row_summary.add(column_index, cell)
+                self._columns[column_index].add(row_index, cell)
+
+    def add_rows(self, start_row):
+        '''
+        Summarizes the rows of the table from start_row onwards, such as after they are appended.
+        Rows before start_row must already be summarized.
+        '''
+        columns = self._columns
+        self._row_range = (min(self._row_range[0], start_row), len(self.table))
+        for row_index in xrange(start_row, len(self.table)):
+            row = self.table[row_index]
+            row_summary = LineSummary()
+            self._rows.append(row_summary)
+            for column_index in nonempty_columns(row):
+                cell = row[column_index]
+                row_summary.add(column_index, cell)
+                if column_index >= len(columns):
+                    columns.extend(LineSummary() for _ in xrange(column_index + 1 - len(columns)))
+                column_summary = columns[column_index]
+                if column_summary != None:
+                    column_summary.add(row_index, cell)
+
+    def row(self, row_index):
+        '''
+        Gets the LineSummary of a row.
+        '''
+        summary = self._rows[row_index]
+        if summary == None:
+            summary = self._rows[row_index] = LineSummary()
+            row = self.table[row_index]
+            for column_index in nonempty_columns(row):
+                summary.add(column_index, row[column_index])
+        return summary
+
+    def column(self, column_index):
+        '''
+        Gets the LineSummary of a column.
+        '''
+        if column_index >= len(self._columns):
+            return LineSummary()
+        summary = self._columns[column_index]
+        if summary == None:
+            summary = self._columns[column_index] = LineSummary()
+            for row_index in xrange(*self._row_range):
+                row = self.table[row_index]
+                if column_index < len(row):
+                    summary.add(row_index, row[column_index])
+        return summary
+
+    def update_cell(self, row_index, column_index, old_cell, new_cell):
+        '''
+        Records that the cell at (row_index, column_index) changed from old_cell to new_cell.
+        '''
+        for journal in self.journals:
+            journal.setdefault((row_index, column_index), old_cell)
+        row_summary = self._rows[row_index]
+        if row_summary != None:
+            if row_summary.remove(column_index, old_cell):
+                row_summary.add(column_index, new_cell)
+            else:
+                self._rows[row_index] = None
+        if column_index >= len(self._columns):
+            self._columns.extend(LineSummary() for _ in xrange(column_index + 1 -
+                                                                  len(self._columns)))
+        column_summary = self._columns[column_index]
+        if column_summary != None:
+            if column_summary.remove(row_index, old_cell):
+                column_summary.add(row_index, new_cell)
+            else:
+                self._columns[column_index] = None
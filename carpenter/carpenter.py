@@ -102,10 +102,11 @@ def row_content_length(row):
     '''
     if not row:
         return 0
-    try:
-        return (index + 1 for index, cell in reversed(list(enumerate(row))) if not is_empty_cell(cell)).next()
-    except StopIteration:
-        return len(row)
+    # Walk back from the end so only the trailing blanks are visited
+    for index in xrange(len(row) - 1, -1, -1):
+        if not is_empty_cell(row[index]):
+            return index + 1
+    return len(row)
 
 def split_block_by_row_length(block, split_row_length):
     '''
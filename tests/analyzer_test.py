@@ -3,8 +3,11 @@ import parentpath
 
 import unittest
 import os
+import random
+import sys
 from os.path import dirname
-from carpenter.blocks import tableanalyzer
+from carpenter.blocks import tableanalyzer, sparsetable, tablesummary
+from carpenter.blocks.block import BlockValidator
 from datawrap import tableloader
 from pprint import pprint
 
@@ -244,6 +247,15 @@ class TableAnalyzerTest(unittest.TestCase):
         expected_flag = ['interpreted', 'interpreted']
         self.compare_conversion(test_number, expected_flag, num_expected_tables, num_expected_blocks)
 
+    def test_numeric_string_flags(self):
+        '''Test flags of converted int and float strings point at their cells'''
+        analyzer = tableanalyzer.TableAnalyzer([[['Item', 'Value'], ['Cost', '1.5'],
+                                                 ['Revenue', '2']]])
+        analyzer.preprocess()
+        self.assertEqual([(flag.location, flag.worksheet)
+                          for flag in analyzer.flags_by_table[0]['minor']],
+                         [((1, 1), 0), ((2, 1), 0)])
+
     def test_ultimate_sheet(self):
         '''Test test_11.csv => test_11_output.xlsx'''
         test_number = 11
@@ -263,5 +275,778 @@ class TableAnalyzerTest(unittest.TestCase):
         self.compare_conversion(test_number, expected_flag, num_expected_tables, num_expected_blocks,
                                 complete_blocks_test=True)
 
+    def compare_analyzer_settings(self, first_rules, second_rules):
+        '''
+        Checks that two sets of analyzer settings find identical blocks for every test table.
+        '''
+        test_runs = [(test_number, {}) for test_number in range(0, 12)] + [
+            (0, { 'skippable_rows': {0: [2]} }),
+            (0, { 'skippable_rows': {0: [2]}, 'blank_repeat_threshold': 0 }),
+            (0, { 'skippable_columns': {0: [3]} }),
+            (12, { 'assume_complete_blocks': True })]
+        for test_number, special_rules in test_runs:
+            found_blocks = []
+            for rules in (first_rules, second_rules):
+                rules = dict(special_rules, **rules)
+                raw_file_name = self.test_block_file_pairs[test_number][0]
+                analyzer = tableanalyzer.TableAnalyzer(self.try_load_data(raw_file_name), **rules)
+                found_blocks.append([(tuple(block.start), tuple(block.end),
+                                      block.get_worst_flag_level(), block.copy_raw_block(),
+                                      block.convert_to_row_table())
+                                     for block in analyzer.generate_blocks()])
+            self.assertEqual(found_blocks[0], found_blocks[1])
+
+    def test_sparse_matches_dense(self):
+        '''Test sparse worksheets find the same blocks as dense worksheets'''
+        self.compare_analyzer_settings({}, { 'sparse': True })
+
+    def test_numpy_complete_blocks_match(self):
+        '''Test the NumPy complete block search finds the same blocks as the cell by cell search'''
+        self.compare_analyzer_settings({ 'assume_complete_blocks': True, 'use_numpy': False },
+                                       { 'assume_complete_blocks': True })
+        self.compare_analyzer_settings({ 'assume_complete_blocks': True, 'use_numpy': False },
+                                       { 'assume_complete_blocks': True, 'sparse': True })
+
+    def test_auto_block_mode(self):
+        '''Test the automatic block mode picks complete blocks only for dense rectangular layouts'''
+        expected_complete = [True, False, False, False, True, True, True, True, False, False,
+                             False, False]
+        for test_number in range(0, 12):
+            raw_file_name = self.test_block_file_pairs[test_number][0]
+            full_analyzer = tableanalyzer.TableAnalyzer(self.try_load_data(raw_file_name))
+            auto_analyzer = tableanalyzer.TableAnalyzer(self.try_load_data(raw_file_name),
+                                                        assume_complete_blocks='auto')
+            full_blocks = full_analyzer.generate_blocks()
+            auto_blocks = auto_analyzer.generate_blocks()
+            block_mode = auto_analyzer.block_modes_by_table[0]
+            self.assertEqual(block_mode['assume_complete_blocks'], expected_complete[test_number])
+            self.assertTrue(block_mode['reason'])
+            self.assertEqual(auto_analyzer.assume_complete_blocks, 'auto')
+            self.assertEqual([(block.start, block.end, block.convert_to_row_table())
+                              for block in full_blocks],
+                             [(block.start, block.end, block.convert_to_row_table())
+                              for block in auto_blocks])
+
+        # Blank edges the full search stretches blocks over and single cells use the full search
+        layouts = [([['Item', '2014'], ['Cost', 1]], True),
+                   ([['Item', '2014'], ['Cost', 1], [None, None]], False),
+                   ([['Item', '2014', None], ['Cost', 1, None]], False),
+                   ([[None, 'Item', '2014'], [None, 'Cost', 1]], False),
+                   ([['Item', '2014'], [None, None], ['Cost', 1]], False),
+                   ([[None], [1]], False)]
+        for table, complete in layouts:
+            auto_analyzer = tableanalyzer.TableAnalyzer([table], blank_repeat_threshold=1,
+                                                        assume_complete_blocks='auto')
+            auto_blocks = auto_analyzer.generate_blocks()
+            self.assertEqual(auto_analyzer.block_modes_by_table[0]['assume_complete_blocks'],
+                             complete)
+            full_blocks = tableanalyzer.TableAnalyzer([table],
+                                                      blank_repeat_threshold=1).generate_blocks()
+            self.assertEqual([(block.start, block.end) for block in full_blocks],
+                             [(block.start, block.end) for block in auto_blocks])
+
+    def test_summaries_track_repairs(self):
+        '''Test the worksheet summaries stay in sync with cells repaired during validation'''
+        for test_number in (1, 10, 11):
+            raw_file_name = self.test_block_file_pairs[test_number][0]
+            analyzer = tableanalyzer.TableAnalyzer(self.try_load_data(raw_file_name))
+            analyzer.generate_blocks()
+            for ptable, summary in zip(analyzer.processed_tables, analyzer.summaries_by_table):
+                fresh_summary = tablesummary.TableSummary(ptable)
+                for row_index in range(len(ptable)):
+                    self.assertEqual(vars(summary.row(row_index)),
+                                     vars(fresh_summary.row(row_index)))
+                for column_index in range(len(ptable[0])):
+                    self.assertEqual(vars(summary.column(column_index)),
+                                     vars(fresh_summary.column(column_index)))
+
+    def test_sparse_from_cells(self):
+        '''Test analyzing a mostly empty SparseTable built from coordinates'''
+        cells = { (5000, 100): 'Title', (5000, 101): 'Value',
+                  (5001, 100): 'Cost', (5001, 101): '$1,200',
+                  (5002, 100): 'Revenue', (5002, 101): '300' }
+        table = sparsetable.SparseTable.from_cells(cells, 5003, 300)
+        analyzer = tableanalyzer.TableAnalyzer([table])
+        blocks = analyzer.generate_blocks()
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual((blocks[0].start, blocks[0].end), ([5000, 100], [5003, 102]))
+        self.assertEqual(blocks[0].convert_to_row_table(),
+                         [['Cost', 'Value', 1200, '$'], ['Revenue', 'Value', 300, None]])
+        self.assertEqual(analyzer.processed_tables[0].stored_count(), len(cells))
+
+    def test_trim_blank_edges(self):
+        '''Test trailing blank rows and columns are trimmed from each worksheet and flagged'''
+        padding = [None] * 20
+        first_sheet = [['Title', 'Value'] + padding, ['Cost', '12'] + padding,
+                       ['Revenue', '30', '  '] + padding]
+        first_sheet.extend([None, ''] + padding for _ in range(500))
+        second_sheet = [['Title', 'Value'], ['Cost', '5']]
+        analyzer = tableanalyzer.TableAnalyzer([first_sheet, second_sheet], trim_blank_edges=True)
+        blocks = analyzer.generate_blocks()
+        self.assertEqual((len(first_sheet), len(first_sheet[0]), len(first_sheet[2])),
+                         (503, 22, 23))
+        self.assertEqual(analyzer.trimmed_by_table, [(500, 21), (0, 0)])
+        self.assertEqual(analyzer.raw_tables[0], [['Title', 'Value'], ['Cost', '12'],
+                                                  ['Revenue', '30']])
+        self.assertEqual([(block.start, block.end) for block in blocks],
+                         [([0, 0], [3, 2]), ([0, 0], [2, 2])])
+        self.assertEqual([(flag.location, flag.message) for flag in
+                          analyzer.flags_by_table[0]['minor'] if flag.message],
+                         [((3, None), 'Trimmed 500 trailing blank rows'),
+                          ((None, 2), 'Trimmed 21 trailing blank columns')])
+        self.assertFalse([flag for flag in analyzer.flags_by_table[1].get('minor', [])
+                          if flag.message])
+
+        untrimmed = tableanalyzer.TableAnalyzer([[['Title', 'Value', None], [None, None, None]]])
+        untrimmed.preprocess()
+        self.assertEqual(untrimmed.trimmed_by_table, [(0, 0)])
+        self.assertEqual(len(untrimmed.raw_tables[0]), 2)
+
+        table = sparsetable.SparseTable.from_cells({ (3, 4): 'Title', (9, 9): '' }, 1000, 1000)
+        analyzer = tableanalyzer.TableAnalyzer([table], trim_blank_edges=True)
+        self.assertEqual(analyzer.trimmed_by_table, [(996, 995)])
+        self.assertEqual((len(table), table.num_columns), (1000, 1000))
+        self.assertEqual((len(analyzer.raw_tables[0]), analyzer.raw_tables[0].num_columns), (4, 5))
+
+    def test_trailing_blank_edges_unchanged(self):
+        '''Test trailing blank rows and columns only change blocks when trimming is requested'''
+        tables = [[['Item', 'Value', None], [None, None, None], ['Cost', '12', None],
+                   ['Revenue', '4', None]],
+                  [[], ['FY 2013', 'FY 2013', None], [], ['FY 2013', '12'], ['(4)', 'Title'],
+                   ['Title', ''], []]]
+        bounds = lambda blocks: [(block.start, block.end) for block in blocks]
+        analyzer = tableanalyzer.TableAnalyzer([[list(row) for row in table] for table in tables])
+        self.assertEqual(bounds(analyzer.generate_blocks()),
+                         [([0, 0], [1, 2]), ([2, 0], [4, 2]), ([1, 0], [2, 2]), ([3, 0], [6, 2])])
+        self.assertEqual(analyzer.trimmed_by_table, [(0, 0), (0, 0)])
+
+        # The search stops at the trimmed edges instead of the blank cells beyond them
+        trimmed = tableanalyzer.TableAnalyzer([[list(row) for row in table] for table in tables],
+                                              trim_blank_edges=True)
+        self.assertEqual(bounds(trimmed.generate_blocks()), [([0, 0], [4, 2]), ([1, 0], [6, 2])])
+        self.assertEqual(trimmed.trimmed_by_table, [(0, 1), (1, 1)])
+
+    def test_ragged_input_unchanged(self):
+        '''Test ragged rows are read as padded without modifying the input table'''
+        for test_number, rules in ((1, {}), (10, {}), (11, { 'assume_complete_blocks': True }),
+                                   (11, { 'sparse': True })):
+            raw_file_name = self.test_block_file_pairs[test_number][0]
+            square_tables = self.try_load_data(raw_file_name)
+            ragged_tables = [[list(row) for row in table] for table in square_tables]
+            for table in ragged_tables:
+                for row in table:
+                    while row and row[-1] in (None, ''):
+                        row.pop()
+            row_lengths = [[len(row) for row in table] for table in ragged_tables]
+
+            square_blocks = tableanalyzer.TableAnalyzer(square_tables, **rules).generate_blocks()
+            ragged_blocks = tableanalyzer.TableAnalyzer(ragged_tables, **rules).generate_blocks()
+            self.assertEqual([(block.start, block.end, block.convert_to_row_table())
+                              for block in square_blocks],
+                             [(block.start, block.end, block.convert_to_row_table())
+                              for block in ragged_blocks])
+            self.assertEqual([[len(row) for row in table] for table in ragged_tables], row_lengths)
+
+    def test_in_place_preprocess(self):
+        '''Test in place preprocessing finds the same blocks and keeps the original values'''
+        self.compare_analyzer_settings({}, { 'in_place': True })
+        self.compare_analyzer_settings({ 'sparse': True }, { 'sparse': True, 'in_place': True })
+
+        raw_file_name = self.test_block_file_pairs[1][0]
+        original_tables = self.try_load_data(raw_file_name)
+        tables = [[list(row) for row in table] for table in original_tables]
+        analyzer = tableanalyzer.TableAnalyzer(tables, in_place=True,
+                                               skippable_rows={0: [2]}, skippable_columns={0: [3]})
+        analyzer.generate_blocks()
+        self.assertIs(analyzer.processed_tables[0][5], analyzer.raw_tables[0][5])
+        self.assertNotEqual(tables, original_tables)
+        for worksheet, table in enumerate(original_tables):
+            for row_index, row in enumerate(table):
+                for column_index, cell in enumerate(row):
+                    original = analyzer.original_cell(worksheet, row_index, column_index)
+                    self.assertEqual((type(original), original), (type(cell), cell))
+        self.assertTrue(analyzer.originals_by_table[0].changed_count())
+
+    def test_lazy_conversion(self):
+        '''Test lazy conversion finds the same blocks and only commits flags for used cells'''
+        self.compare_analyzer_settings({}, { 'lazy_conversion': True })
+        self.compare_analyzer_settings({ 'sparse': True },
+                                       { 'sparse': True, 'lazy_conversion': True })
+
+        table = [['Item', '2014', '2015'], ['Cost', '$12', '14'], ['Revenue', '3', '4'],
+                 [None, None, None], ['notes on revenue', None, '(see note 3)']]
+        analyzer = tableanalyzer.TableAnalyzer([table], lazy_conversion=True)
+        analyzer.preprocess()
+        self.assertEqual(analyzer.processed_tables[0][4], ['notes on revenue', None, 'see note 3'])
+        self.assertEqual(analyzer.flags_by_table[0], {})
+        self.assertEqual(analyzer.units_by_table[0], {})
+        self.assertEqual(sorted(analyzer.deferred_by_table[0]), [0, 1, 2, 4])
+
+        self.assertEqual(analyzer.converted_cell(0, 4, 2), 'see note 3')
+        self.assertEqual(sorted(flag.location for flags in analyzer.flags_by_table[0].values()
+                                for flag in flags), [(4, 2), (4, 2)])
+        self.assertEqual(sorted(analyzer.deferred_by_table[0]), [0, 1, 2])
+
+    def analysis_results(self, analyzer):
+        '''
+        Gets the blocks and flags found by an analyzer, with the flags of each worksheet sorted.
+        '''
+        return ([(tuple(block.start), tuple(block.end), block.copy_raw_block(),
+                  block.convert_to_row_table()) for block in analyzer.processed_blocks],
+                [sorted((level, tuple(flag.location), flag.message) for level in flags
+                        for flag in flags[level]) for flags in analyzer.flags_by_table])
+
+    def compare_incremental_analysis(self, all_rules, analyze):
+        '''
+        Checks that analyzing each test table incrementally finds the same blocks and flags as
+        analyzing the final tables at once. analyze(test_number, rules) analyzes a test table
+        incrementally and returns the analyzer along with the final tables.
+        '''
+        for rules in all_rules:
+            for test_number in range(0, 12):
+                analyzer, tables = analyze(test_number, rules)
+                expected = tableanalyzer.TableAnalyzer(tables, **rules)
+                expected.generate_blocks()
+                self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+
+    def test_update_cells(self):
+        '''Test editing cells finds the same blocks and flags as analyzing the edited tables'''
+        def analyze(test_number, rules):
+            raw_file_name = self.test_block_file_pairs[test_number][0]
+            table = self.try_load_data(raw_file_name)
+            num_columns = max(len(row) for row in table[0])
+            edits = { (2, 1): None, (len(table[0]) // 2, num_columns - 1): u'12',
+                      (len(table[0]) - 1, 0): u'Total' }
+            for (row_index, column_index), value in edits.items():
+                if column_index >= len(table[0][row_index]):
+                    del edits[(row_index, column_index)]
+
+            analyzer = tableanalyzer.TableAnalyzer(table, **rules)
+            analyzer.generate_blocks()
+            analyzer.update_cells(0, edits)
+
+            edited_table = self.try_load_data(raw_file_name)
+            for (row_index, column_index), value in edits.items():
+                edited_table[0][row_index][column_index] = value
+            return analyzer, edited_table
+        self.compare_incremental_analysis(({}, { 'sparse': True }, { 'in_place': True },
+                                           { 'lazy_conversion': True },
+                                           { 'assume_complete_blocks': 'auto' }), analyze)
+
+        # Edits which change the block mode chosen by 'auto' search the whole worksheet again
+        table = [['Item', '2014'], ['Cost', '1'], ['Rev', '2']]
+        analyzer = tableanalyzer.TableAnalyzer([table], assume_complete_blocks='auto')
+        analyzer.generate_blocks()
+        self.assertTrue(analyzer.block_modes_by_table[0]['assume_complete_blocks'])
+        analyzer.update_cells(0, { (1, 1): None })
+        expected = tableanalyzer.TableAnalyzer([[['Item', '2014'], ['Cost', None], ['Rev', '2']]],
+                                               assume_complete_blocks='auto')
+        expected.generate_blocks()
+        self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+        self.assertEqual(analyzer.block_modes_by_table, expected.block_modes_by_table)
+        self.assertEqual([(block.start, block.end) for block in analyzer.processed_blocks],
+                         [([0, 0], [3, 2])])
+        self.assertFalse(analyzer.block_modes_by_table[0]['assume_complete_blocks'])
+
+        # Cells of trimmed blank edges can't be edited
+        table = [['Item', 'Value', None], ['Cost', '12', ''], [None, None, None]]
+        analyzer = tableanalyzer.TableAnalyzer([table], trim_blank_edges=True)
+        analyzer.generate_blocks()
+        results = self.analysis_results(analyzer)
+        for cells in ({ (2, 0): 'Revenue' }, { (0, 2): '2015' }, { (1, 0): 'Costs', (2, 0): '4' }):
+            self.assertRaises(ValueError, analyzer.update_cells, 0, cells)
+        self.assertEqual(self.analysis_results(analyzer), results)
+        self.assertEqual(table, [['Item', 'Value', None], ['Cost', '12', ''], [None, None, None]])
+
+        # Searches left of an edit which read the edited row are searched again
+        table = [[None, '2014', None, None, 1, 'FY 2013'],
+                 ['Cost', None, '2014', None, 'Title', 2.5]]
+        analyzer = tableanalyzer.TableAnalyzer([[list(row) for row in table]],
+                                               blank_repeat_threshold=0)
+        analyzer.generate_blocks()
+        for edits in ({ (0, 1): 'Cost' }, { (1, 2): '2014', (1, 3): None, (1, 4): '(4)' }):
+            analyzer.update_cells(0, edits)
+            for (row_index, column_index), value in edits.items():
+                table[row_index][column_index] = value
+        expected = tableanalyzer.TableAnalyzer([table], blank_repeat_threshold=0)
+        expected.generate_blocks()
+        self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+        self.assertEqual([(block.start, block.end) for block in analyzer.processed_blocks],
+                         [([0, 4], [1, 6]), ([1, 0], [2, 1])])
+
+        # Random edits of small tables find what analyzing the edited tables does
+        rand = random.Random(35)
+        cells = [None, None, None, None, '', 'Title', 'Cost', '12', '(4)', 2.5, 1, '2014', '$3',
+                 'FY 2013']
+        for _ in range(300):
+            num_rows, num_columns = rand.randint(2, 8), rand.randint(2, 8)
+            table = [[rand.choice(cells) for _ in range(num_columns)] for _ in range(num_rows)]
+            threshold = rand.choice([0, 1, 2, 3])
+            analyzer = tableanalyzer.TableAnalyzer([[list(row) for row in table]],
+                                                   blank_repeat_threshold=threshold)
+            analyzer.generate_blocks()
+            for _ in range(rand.randint(1, 3)):
+                edits = dict(((rand.randrange(num_rows), rand.randrange(num_columns)),
+                              rand.choice(cells)) for _ in range(rand.randint(1, 3)))
+                analyzer.update_cells(0, edits)
+                for (row_index, column_index), value in edits.items():
+                    table[row_index][column_index] = value
+                expected = tableanalyzer.TableAnalyzer([[list(row) for row in table]],
+                                                       blank_repeat_threshold=threshold)
+                expected.generate_blocks()
+                self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+
+    def test_append_rows(self):
+        '''Test appending rows finds the same blocks and flags as analyzing the whole tables'''
+        def analyze(test_number, rules):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            split = len(table) // 2
+            analyzer = tableanalyzer.TableAnalyzer([table[:split]], **rules)
+            analyzer.generate_blocks()
+            for row_index in range(split, len(table), 3):
+                analyzer.append_rows(0, table[row_index:row_index + 3])
+            return analyzer, [self.try_load_data(self.test_block_file_pairs[test_number][0])[0]]
+        self.compare_incremental_analysis(({}, { 'sparse': True }, { 'in_place': True },
+                                           { 'lazy_conversion': True },
+                                           { 'assume_complete_blocks': 'auto' }), analyze)
+
+        # Rows continuing the last block extend it rather than starting a new search
+        table = [['Item', '2014', '2015'], ['Cost', '12', '14'], ['Revenue', '3', '4']]
+        analyzer = tableanalyzer.TableAnalyzer([table], trim_blank_edges=True)
+        block = analyzer.generate_blocks()[0]
+        self.assertEqual(analyzer.append_rows(0, [['Profit', '9', '10'], [None, None, None]]),
+                         [block])
+        self.assertEqual(block.end, [4, 3])
+        self.assertEqual(analyzer.trimmed_by_table[0], (1, 0))
+
+        # Rows which change the block mode chosen by 'auto' search the whole worksheet again
+        table = [['Item', '2014'], ['Cost', '1'], ['Rev', '2']]
+        analyzer = tableanalyzer.TableAnalyzer([table[:2]], assume_complete_blocks='auto')
+        analyzer.generate_blocks()
+        self.assertTrue(analyzer.block_modes_by_table[0]['assume_complete_blocks'])
+        analyzer.append_rows(0, [['Rev', None], ['Total', '3']])
+        expected = tableanalyzer.TableAnalyzer([table[:2] + [['Rev', None], ['Total', '3']]],
+                                               assume_complete_blocks='auto')
+        expected.generate_blocks()
+        self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+        self.assertEqual(analyzer.block_modes_by_table, expected.block_modes_by_table)
+        self.assertFalse(analyzer.block_modes_by_table[0]['assume_complete_blocks'])
+
+        # Blocks searched up to the old end are searched again with the new rows
+        table = [['12', None], [None, None], [None, None], [None, ''], [None, None]]
+        analyzer = tableanalyzer.TableAnalyzer([[list(row) for row in table]],
+                                               blank_repeat_threshold=2)
+        analyzer.generate_blocks()
+        for rows in ([['(4)', None], [None, '2014'], [None, None]], [['$3', None]],
+                     [[None, None]] * 3):
+            analyzer.append_rows(0, [list(row) for row in rows])
+            table.extend(rows)
+        expected = tableanalyzer.TableAnalyzer([table], blank_repeat_threshold=2)
+        expected.generate_blocks()
+        self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+        self.assertEqual([(block.start, block.end) for block in analyzer.processed_blocks],
+                         [([0, 0], [12, 2])])
+
+        # A block extended over new rows is searched again when later rows follow it
+        analyzer = tableanalyzer.TableAnalyzer([[['12'], [1]]], blank_repeat_threshold=1,
+                                               assume_complete_blocks=True)
+        analyzer.generate_blocks()
+        self.assertEqual(len(analyzer.append_rows(0, [[2.5], ['(4)'], [1]])), 1)
+        analyzer.append_rows(0, [[''], ['(4)']])
+        expected = tableanalyzer.TableAnalyzer([[['12'], [1], [2.5], ['(4)'], [1], [''], ['(4)']]],
+                                               blank_repeat_threshold=1,
+                                               assume_complete_blocks=True)
+        expected.generate_blocks()
+        self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+        self.assertEqual([(block.start, block.end) for block in analyzer.processed_blocks],
+                         [([0, 0], [5, 1]), ([6, 0], [7, 1])])
+
+        # Random splits of small tables find what analyzing the whole tables does
+        rand = random.Random(36)
+        cells = [None, None, None, None, '', 'Title', 'Cost', '12', '(4)', 2.5, 1, '2014', '$3',
+                 'FY 2013']
+        for _ in range(300):
+            num_rows, num_columns = rand.randint(2, 14), rand.randint(1, 6)
+            table = [[rand.choice(cells) for _ in range(rand.randint(1, num_columns))]
+                     for _ in range(num_rows)]
+            # Trimming a blank table would leave it empty
+            table[0][0] = '12'
+            rules = { 'blank_repeat_threshold': rand.choice([0, 1, 2, 3]) }
+            rules.update(rand.choice([{}, { 'trim_blank_edges': True }, { 'sparse': True },
+                                      { 'assume_complete_blocks': 'auto' }]))
+            split = rand.randint(1, num_rows - 1)
+            analyzer = tableanalyzer.TableAnalyzer([[list(row) for row in table[:split]]],
+                                                   **rules)
+            analyzer.generate_blocks()
+            while split < num_rows:
+                rows = table[split:split + rand.randint(1, 4)]
+                analyzer.append_rows(0, [list(row) for row in rows])
+                split += len(rows)
+            expected = tableanalyzer.TableAnalyzer([[list(row) for row in table]], **rules)
+            expected.generate_blocks()
+            self.assertEqual(self.analysis_results(analyzer), self.analysis_results(expected))
+
+    def test_regions(self):
+        '''Test analyzing a region matches analyzing it as its own table at absolute positions'''
+        for rules in ({}, { 'sparse': True }):
+            for test_number in range(0, 12):
+                table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+                start_pos = (len(table) // 3, 1)
+                end_pos = (len(table), max(len(row) for row in table))
+                analyzer = tableanalyzer.TableAnalyzer([table], **rules)
+                analyzer.generate_blocks(regions={ 0: (start_pos, end_pos) })
+
+                region_table = [row[start_pos[1]:end_pos[1]] for row in table[start_pos[0]:]]
+                expected = tableanalyzer.TableAnalyzer([region_table], **rules)
+                expected.generate_blocks()
+                self.assertEqual([(tuple(block.start), tuple(block.end), block.copy_raw_block(),
+                                   block.convert_to_row_table())
+                                  for block in analyzer.processed_blocks],
+                                 [((block.start[0] + start_pos[0], block.start[1] + start_pos[1]),
+                                   (block.end[0] + start_pos[0], block.end[1] + start_pos[1]),
+                                   block.copy_raw_block(), block.convert_to_row_table())
+                                  for block in expected.processed_blocks
+                                  if isinstance(block, tableanalyzer.TableBlock)])
+                self.assertEqual(analyzer.units_by_table[0], dict(
+                    ((row_index + start_pos[0], column_index + start_pos[1]), unit)
+                    for (row_index, column_index), unit in expected.units_by_table[0].items()))
+
+        # Worksheets without a region are left empty
+        analyzer = tableanalyzer.TableAnalyzer([[['a', '1']], [['Item', '2014'], ['Cost', '$12']]])
+        blocks = analyzer.generate_blocks(regions={ 1: ((1, 0), (5, 5)) })
+        self.assertEqual([(block.worksheet, block.start, block.end) for block in blocks],
+                         [(1, [1, 0], [2, 2])])
+        self.assertEqual(analyzer.regions_by_table, [((0, 0), (0, 0)), ((1, 0), (2, 2))])
+        self.assertEqual(analyzer.units_by_table[1], { (1, 1): '$' })
+
+    def test_iter_blocks(self):
+        '''Test iterating blocks matches generate_blocks and preprocesses worksheets lazily'''
+        def load_tables():
+            return [self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+                    for test_number in range(0, 4)]
+        for rules in ({}, { 'assume_complete_blocks': 'auto' }):
+            expected = tableanalyzer.TableAnalyzer(load_tables(), **rules)
+            expected.generate_blocks()
+            analyzer = tableanalyzer.TableAnalyzer(load_tables(), **rules)
+            blocks = analyzer.iter_blocks()
+            first = next(blocks)
+            self.assertEqual(first.worksheet, 0)
+            self.assertEqual(len(analyzer.processed_tables), 1)
+            self.assertEqual([(block.worksheet, block.start, block.end,
+                               block.convert_to_row_table()) for block in [first] + list(blocks)],
+                             [(block.worksheet, block.start, block.end,
+                               block.convert_to_row_table())
+                              for block in expected.processed_blocks])
+            self.assertEqual(analyzer.flags_by_table, expected.flags_by_table)
+            self.assertEqual(analyzer.block_modes_by_table, expected.block_modes_by_table)
+
+    def test_band_processes(self):
+        '''Test splitting worksheets into bands for worker processes matches serial analysis'''
+        def load_tables():
+            tables = [self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+                      for test_number in range(0, 6)]
+            # One tall worksheet stacking the others and one wide worksheet of their columns
+            tall = [list(row) for table in tables for row in table + [[]] * 4]
+            width = max(len(row) for row in tables[1])
+            wide = [[row[column_index] if column_index < len(row) else None for row in tables[1]]
+                    for column_index in xrange(width)]
+            return tables + [tall, wide]
+        for rules in ({}, { 'assume_complete_blocks': True }):
+            expected = tableanalyzer.TableAnalyzer(load_tables(), **rules)
+            expected.generate_blocks()
+            analyzer = tableanalyzer.TableAnalyzer(load_tables(), processes=3, **rules)
+            analyzer.BAND_MIN_CELLS = 0
+            analyzer.generate_blocks()
+            self.assertEqual([(block.worksheet, block.start, block.end,
+                               block.convert_to_row_table())
+                              for block in analyzer.processed_blocks],
+                             [(block.worksheet, block.start, block.end,
+                               block.convert_to_row_table())
+                              for block in expected.processed_blocks])
+            self.assertEqual(analyzer.units_by_table, expected.units_by_table)
+            self.assertEqual(analyzer.flags_by_table, expected.flags_by_table)
+
+        # Blocks found right of a seam can start left of it, past the area searched again
+        table = [[None, None, None, 1, '(4)', None, '(4)'],
+                 ['(4)', '(4)', '2014', 2.5, 'Cost', '(4)', '12'],
+                 [None, '$3', None, None, '', None, '2014'],
+                 ['12', 'Title', 'Title', '2014', 'Title', 'Cost', 'Cost'],
+                 [2.5, None, None, 2.5, '', '12', None]]
+        expected = tableanalyzer.TableAnalyzer([[list(row) for row in table]],
+                                               blank_repeat_threshold=0)
+        expected.generate_blocks()
+        self.assertEqual([(block.start, block.end) for block in expected.processed_blocks],
+                         [([1, 0], [2, 7]), ([3, 0], [4, 7])])
+        analyzer = tableanalyzer.TableAnalyzer([[list(row) for row in table]],
+                                               blank_repeat_threshold=0, processes=2)
+        analyzer.BAND_MIN_CELLS = 1
+        analyzer.generate_blocks()
+        self.assertEqual([(block.start, block.end) for block in analyzer.processed_blocks],
+                         [(block.start, block.end) for block in expected.processed_blocks])
+        self.assertEqual(analyzer.flags_by_table, expected.flags_by_table)
+
+    def test_band_processes_order(self):
+        '''Test blocks and flags of bands are listed in the order a serial search finds them'''
+        def load_tables():
+            return [[['$3', None, '(4)', None], ['2014', 2.5, 1, 2.5], [None, '', None, None],
+                     [None, 'Title', '', '(4)'], [None, None, None, 1], [1, '(4)', 1, 'Cost'],
+                     [2.5, 2.5, None, None], ['Title', 'Cost', None, '$3']]]
+        expected = tableanalyzer.TableAnalyzer(load_tables(), blank_repeat_threshold=1)
+        expected.generate_blocks()
+        # The block found from [3, 1] doesn't cover that cell, so comes before the one at [3, 0]
+        self.assertEqual([(block.start, block.end) for block in expected.processed_blocks],
+                         [([0, 0], [2, 4]), ([3, 1], [4, 2]), ([3, 0], [8, 3]), ([3, 3], [8, 4])])
+        for processes in range(2, 5):
+            analyzer = tableanalyzer.TableAnalyzer(load_tables(), blank_repeat_threshold=1,
+                                                   processes=processes)
+            analyzer.BAND_MIN_CELLS = 1
+            analyzer.generate_blocks()
+            self.assertEqual([(block.start, block.end) for block in analyzer.processed_blocks],
+                             [(block.start, block.end) for block in expected.processed_blocks])
+            self.assertEqual(analyzer.flags_by_table, expected.flags_by_table)
+
+    def test_snapshot_restore(self):
+        '''Test restoring a snapshot matches preprocessing again for other block settings'''
+        def load_tables():
+            return [self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+                    for test_number in range(0, 8)]
+        def analysis(analyzer):
+            return ([(block.worksheet, block.start, block.end, block.convert_to_row_table())
+                     for block in analyzer.processed_blocks], analyzer.flags_by_table,
+                    analyzer.units_by_table,
+                    [map(list, table) for table in analyzer.processed_tables])
+        for rules in ({}, { 'in_place': True }, { 'lazy_conversion': True }):
+            analyzer = tableanalyzer.TableAnalyzer(load_tables(), **rules)
+            snapshot = analyzer.snapshot()
+            for settings in ({ 'max_title_rows': 1 }, { 'blank_repeat_threshold': 1 },
+                             { 'assume_complete_blocks': True }, {}):
+                analyzer.restore(snapshot)
+                analyzer.max_title_rows = settings.get('max_title_rows', sys.maxint / 2)
+                analyzer.blank_repeat_threshold = settings.get('blank_repeat_threshold', 3)
+                analyzer.generate_blocks(settings.get('assume_complete_blocks', False))
+
+                settings.update(rules)
+                expected = tableanalyzer.TableAnalyzer(load_tables(), **settings)
+                expected.generate_blocks()
+                self.assertEqual(analysis(analyzer), analysis(expected))
+
+            # Edits aren't undone by a snapshot
+            analyzer.update_cells(0, { (0, 0): 'Item' })
+            self.assertRaises(ValueError, analyzer.restore, snapshot)
+            snapshot.release()
+            self.assertEqual(analyzer.summaries_by_table[0].journals, [])
+
+    def test_string_pool(self):
+        '''Test converted text cells and row table titles share one string per value'''
+        for rules in ({}, { 'in_place': True }, { 'lazy_conversion': True }, { 'sparse': True }):
+            tables = [self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+                      for test_number in range(0, 8)]
+            analyzer = tableanalyzer.TableAnalyzer(tables, **rules)
+            strings = {}
+            def check_shared(cell):
+                if isinstance(cell, basestring):
+                    self.assertTrue(strings.setdefault((type(cell), cell), cell) is cell)
+            for block in analyzer.generate_blocks():
+                if isinstance(block, tableanalyzer.TableBlock):
+                    for row in block.convert_to_row_table():
+                        for title in row[:-2]:
+                            check_shared(title)
+            for table in analyzer.processed_tables:
+                for row in table:
+                    for cell in row:
+                        check_shared(cell)
+            self.assertEqual(len(analyzer.string_pool), len(strings))
+            self.assertTrue(analyzer.string_pool.bytes_saved > 0)
+
+        # Equal str and unicode cells keep their own types
+        table = [['Item', u'Item', 'Total'], ['Cost', '1', '2'], [u'Cost', '3', '4']]
+        analyzer = tableanalyzer.TableAnalyzer([table])
+        analyzer.preprocess()
+        self.assertEqual([[type(cell) for cell in row if isinstance(cell, basestring)]
+                          for row in analyzer.processed_tables[0]],
+                         [[str, unicode, str], [str], [unicode]])
+        self.assertEqual(len(analyzer.string_pool), 5)
+        self.assertTrue('Cost' in analyzer.string_pool and u'Cost' in analyzer.string_pool)
+        self.assertFalse(u'Total' in analyzer.string_pool)
+
+    def test_flag_index(self):
+        '''Test indexed flag lookups match checking every flag, including after edits'''
+        def check_flags(analyzer):
+            for block in analyzer.processed_blocks:
+                if not isinstance(block, tableanalyzer.TableBlock):
+                    continue
+                expected = {}
+                for level, level_flags in block.flags.iteritems():
+                    related = [flag for flag in level_flags if block.flag_is_related(flag)]
+                    if related:
+                        expected[level] = related
+                self.assertEqual(block.get_relavent_flags(), expected)
+                self.assertEqual(block.get_relavent_flags(['interpreted', 'error']),
+                                 dict((level, level_flags) for level, level_flags
+                                      in expected.iteritems() if level in ('interpreted', 'error')))
+                self.assertEqual(block.get_worst_flag_level(),
+                                 tableanalyzer.Flagable.get_worst_flag_level(block, expected))
+        for test_number in range(0, 12):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            analyzer = tableanalyzer.TableAnalyzer([table])
+            analyzer.generate_blocks()
+            check_flags(analyzer)
+            # Edits replace the flags around them, which are then indexed again
+            analyzer.update_cells(0, { (2, 1): '(12)', (3, 2): '$5' })
+            check_flags(analyzer)
+
+    def test_block_view(self):
+        '''Test block views read the same cells as copies of the block'''
+        for test_number in range(0, 12):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            analyzer = tableanalyzer.TableAnalyzer([table])
+            for block in analyzer.generate_blocks():
+                if not isinstance(block, tableanalyzer.TableBlock):
+                    continue
+                view = block.view()
+                copied = block.copy_raw_block()
+                self.assertEqual(view.copy(), copied)
+                self.assertEqual(view.shape, (len(copied), len(copied[0])))
+                self.assertEqual([row.copy() for row in view], copied)
+                self.assertEqual([column.copy() for column in view.columns()],
+                                 map(list, zip(*copied)))
+                self.assertEqual(view[1:, 1:].copy(), [row[1:] for row in copied[1:]])
+                self.assertEqual(view[-1, :2], copied[-1][:2])
+                self.assertEqual(view[:, 0].copy(), [row[0] for row in copied])
+                self.assertEqual(view[0, -1], copied[0][-1])
+                self.assertFalse(hasattr(view, '__dict__') or hasattr(view[0], '__dict__'))
+                self.assertRaises(IndexError, lambda: view[len(copied)])
+                self.assertRaises(ValueError, lambda: view[::2])
+
+                # Views read the table rather than a copy of it
+                block.table[block.start[0]][block.start[1]] = 'Changed'
+                self.assertEqual(view[0][0], 'Changed')
+                self.assertNotEqual(copied[0][0], 'Changed')
+
+    def test_validate_cells(self):
+        '''Test type changes along rows and columns are flagged rows first, then columns'''
+        table = [['a', 1, 'b', 2],
+                 ['c', 'd', 3, 'e'],
+                 ['f', None, 5, 'g'],
+                 ['h', 4, 'i', 6]]
+        used_cells = [[False] * 4 for _ in table]
+        used_cells[2][2] = True
+        flags = {}
+        validator = BlockValidator(table, 0, flags, used_cells, [0, 0], [4, 4])
+        validator._validate_cells()
+        self.assertEqual([flag.location for flag in flags['error']], [(2, 2)])
+        self.assertEqual([flag.location for flag in flags['warning']],
+                         [(0, 1), (0, 2), (1, 2), (2, 1), (2, 2), (3, 1), (3, 2),
+                          (1, 1), (2, 1), (2, 2), (2, 3)])
+        self.assertTrue(all(all(row) for row in used_cells))
+
+    def test_rejected_block(self):
+        '''Test rejected blocks leave the table and flags as they were'''
+        table = [[None, '2010', '2011'],
+                 ['a', 1, 2],
+                 [None, 3, 4]]
+        used_cells = [[False] * 3 for _ in table]
+        flags = {}
+        self.assertEqual(tableanalyzer.TableBlock.create(table, used_cells, [0, 0], [0, 3],
+                                                         flags=flags), None)
+        self.assertRaises(tableanalyzer.InvalidBlockError, tableanalyzer.TableBlock, table,
+                          used_cells, [1, 0], [1, 3], flags=flags)
+        self.assertEqual(flags, {})
+
+        class RejectingValidator(BlockValidator):
+            def _check_and_repair(self):
+                BlockValidator._check_and_repair(self)
+                return False
+        expected = [list(row) for row in table]
+        summary = tablesummary.TableSummary(table)
+        validator = RejectingValidator(table, 0, flags, used_cells, [0, 0], [3, 3],
+                                       summary=summary)
+        self.assertFalse(validator.validate_block())
+        self.assertEqual(table, expected)
+        self.assertEqual(flags, {})
+        self.assertEqual(summary.column(0).text_count, 1)
+
+        # The same block is repaired and flagged once it is accepted
+        block = tableanalyzer.TableBlock(table, [[False] * 3 for _ in table], [0, 0], [3, 3],
+                                         flags=flags, summary=summary)
+        self.assertNotEqual(table, expected)
+        self.assertTrue(flags)
+        self.assertEqual(block.get_relavent_flags(), flags)
+
+    def test_iter_row_table(self):
+        '''Test streaming the row table of a block matches converting it'''
+        for test_number in range(0, 12):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            analyzer = tableanalyzer.TableAnalyzer([table])
+            for block in analyzer.generate_blocks():
+                if isinstance(block, tableanalyzer.TableBlock):
+                    for add_units in (True, False):
+                        rows = block.iter_row_table(add_units)
+                        self.assertFalse(isinstance(rows, list))
+                        self.assertEqual(list(rows), block.convert_to_row_table(add_units))
+
+        # Blocks without numbers fall back to their cells
+        analyzer = tableanalyzer.TableAnalyzer([[['Item', 'Name'], ['a', 'b']]])
+        block = analyzer.generate_blocks()[0]
+        self.assertEqual(list(block.iter_row_table(False)), [['Item', 'Name'], ['a', 'b']])
+
+    def test_row_table_slice(self):
+        '''Test slicing the row table of a block matches slicing the converted table'''
+        for test_number in range(0, 12):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            analyzer = tableanalyzer.TableAnalyzer([table])
+            for block in analyzer.generate_blocks():
+                if isinstance(block, tableanalyzer.TableBlock):
+                    row_table = block.convert_to_row_table()
+                    for offset in range(0, len(row_table) + 2, 3):
+                        for limit in (0, 1, 5):
+                            self.assertEqual(block.row_table_slice(offset, limit),
+                                             row_table[offset:offset + limit])
+                    self.assertEqual(block.row_table_slice(1, 2, add_units=False),
+                                     block.convert_to_row_table(add_units=False)[1:3])
+        self.assertRaises(ValueError, block.row_table_slice, -1, 5)
+
+    @unittest.skipIf(tableanalyzer.occupancy.numpy == None, "numpy is not installed")
+    def test_to_columns(self):
+        '''Test the columnar export of a block agrees with its row table'''
+        for test_number in range(0, 12):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            analyzer = tableanalyzer.TableAnalyzer([table])
+            for block in analyzer.generate_blocks():
+                if not isinstance(block, tableanalyzer.TableBlock):
+                    continue
+                columns = block.to_columns()
+                self.assertEqual(columns.values.shape, (block.end[0] - columns.data_start[0],
+                                                        block.end[1] - columns.data_start[1]))
+                self.assertEqual(columns.values.shape, columns.unit_codes.shape)
+                exported = []
+                for row_index, column_index in zip(*(~columns.mask).nonzero()):
+                    code = columns.unit_codes[row_index, column_index]
+                    exported.append(columns.row_labels[row_index] +
+                                    columns.column_labels[column_index] +
+                                    [columns.values[row_index, column_index],
+                                     columns.units[code] if code >= 0 else None])
+                self.assertEqual(exported, block.convert_to_row_table())
+
+    def test_to_star_schema(self):
+        '''Test the star schema export of a block rebuilds its row table'''
+        for test_number in range(0, 12):
+            table = self.try_load_data(self.test_block_file_pairs[test_number][0])[0]
+            analyzer = tableanalyzer.TableAnalyzer([table])
+            for block in analyzer.generate_blocks():
+                if not isinstance(block, tableanalyzer.TableBlock):
+                    continue
+                schema = block.to_star_schema()
+                self.assertEqual(len(set(schema.row_titles)), len(schema.row_titles))
+                self.assertEqual(len(set(schema.column_titles)), len(schema.column_titles))
+                exported = []
+                for fact in zip(schema.row_keys, schema.column_keys, schema.values,
+                                schema.unit_codes):
+                    row_key, column_key, value, code = fact
+                    exported.append(list(schema.row_titles[row_key]) +
+                                    list(schema.column_titles[column_key]) +
+                                    [value, schema.units[code] if code >= 0 else None])
+                self.assertEqual(exported, block.convert_to_row_table())
+
 if __name__ == "__main__":
     unittest.main()